@@ -0,0 +1,349 @@
+from imports import *
+from bilinear_interpolation_scene import COLORS as BILINEAR_COLORS
+from math import cos, log, pi, sin
+import argparse
+import json
+import platform
+import random
+import re
+import time
+import timeit
+import tracemalloc
+from PIL import Image
+from texture_coordinates_scene import COLOR_MAP as TEXTURE_COLOR_MAP
+import point_transforms
+import sampling
+
+RESULTS_DIRECTORY = f"{DIRECTORY}/benchmark_results"
+BASELINE_FILENAME = f"{RESULTS_DIRECTORY}/baseline.json"
+LATEST_FILENAME = f"{RESULTS_DIRECTORY}/latest.json"
+
+REPEAT = 5
+REGRESSION_THRESHOLD = 1.2
+
+SCALING_REPEAT = 3
+SAMPLE_COUNTS = [1000, 10000]
+
+PROJECTION_MATRIX = np.array([
+    [2 / (16 / 9), 0, 0, 0],
+    [0, 2, 0, 0],
+    [0, 0, -1.5, -2.5],
+    [0, 0, -1, 0],
+])
+
+def cubify_loop(points, power):
+    # The per-point version camera_projection_scene.py used before point_transforms.cubify
+    for i in range(points.shape[0]):
+        p = points[i]
+        factor = max([abs(j) for j in p])
+        factor = pow(factor, power)
+        if factor > 1e-6:
+            points[i] = p / factor
+    return points
+
+WARP_MATRIX = np.array([
+    [1.2, 0.3, 0],
+    [-0.2, 0.9, 0],
+    [0, 0, 1],
+])
+
+def random_pattern(size):
+    generator = random.Random(size)
+    return ["".join(generator.choice(list(TEXTURE_COLOR_MAP)) for _ in range(size)) for _ in range(size)]
+
+def warp_square_loop(square, matrix):
+    # The per-square, per-point warp texture_coordinates_scene.py used before PointBuffer
+    def warp_points(points):
+        for i in range(points.shape[0]):
+            points[i] = matrix @ points[i]
+        return points
+    square.restore()
+    square.shift(LEFT)
+    square.apply_points_function_about_point(warp_points, about_point=ORIGIN)
+    square.shift(RIGHT)
+
+def sample_bilinear_loop(colors, coordinates):
+    # One sample at a time with manim's color helpers, the way the bilinear scene used to mix its colors
+    result = []
+    for x, y in coordinates:
+        ix = max(0, min(int(np.floor(x)), len(colors[0]) - 2))
+        iy = max(0, min(int(np.floor(y)), len(colors) - 2))
+        alpha = min(max(x - ix, 0), 1)
+        beta = min(max(y - iy, 0), 1)
+        result.append(interpolate_color(interpolate_color(colors[iy][ix], colors[iy][ix + 1], alpha), interpolate_color(colors[iy + 1][ix], colors[iy + 1][ix + 1], alpha), beta))
+    return result
+
+def random_coordinates(count, size):
+    # Texel coordinates reaching one texel past every edge, so all wrap modes get exercised
+    generator = np.random.default_rng(count)
+    return generator.uniform(-1, 1, (count, 2)) + generator.uniform(0, 1, (count, 2)) * (np.array(size) - 1)
+
+def create_scene():
+    # A CGScene in the state construct() leaves it in, which never renders a frame
+    scene = CGScene()
+    scene.title_text = Text("Benchmark")
+    scene.add(scene.title_text)
+    scene.caption = None
+    scene.caption_text = ""
+    scene.default_caption_pos = DOWN * 2.8
+    return scene
+
+def time_function(function, repeat=REPEAT):
+    # Run once to warm up caches, then keep the best of `repeat` runs
+    function()
+    times = timeit.Timer(function).repeat(repeat=repeat, number=1)
+    return {
+        "best": min(times),
+        "mean": sum(times) / len(times),
+        "repeat": repeat,
+    }
+
+def get_benchmarks():
+    scene = create_scene()
+    bilinear_scene = load_scene_class(f"{DIRECTORY}/bilinear_interpolation_scene.py")
+    matrix_reading_order_scene = load_scene_class(f"{DIRECTORY}/matrix_reading_order_scene.py")
+    texture_coordinates_scene = load_scene_class(f"{DIRECTORY}/texture_coordinates_scene.py")
+
+    def swap_caption():
+        scene.swap_caption("The closer the sample point is to a corner, the bigger its opposing rectangle.", t2c={"closer": "#FFFF00"})
+        scene.remove(scene.caption)
+
+    def all_objects():
+        for _ in range(200):
+            scene.add(Square(0.1))
+        scene.all_objects()
+        scene.clear()
+        scene.add(scene.title_text)
+
+    arrow = Arrow().put_start_and_end_on(ORIGIN, RIGHT)
+    square = Square()
+
+    benchmarks = {}
+    for size in [5, 10, 20, 40]:
+        benchmarks[f"generate_grid[{size}]"] = lambda size=size: scene.generate_grid(((-size, size), (-size, size)))
+    benchmarks["generate_crosshairs"] = scene.generate_crosshairs
+    benchmarks["swap_caption"] = swap_caption
+    benchmarks["appear[arrow]"] = lambda: scene.appear(arrow.copy())
+    benchmarks["appear[square]"] = lambda: scene.appear(square.copy())
+    benchmarks["disappear[arrow]"] = lambda: scene.disappear(arrow.copy())
+    benchmarks["disappear[square]"] = lambda: scene.disappear(square.copy())
+    benchmarks["all_objects[200]"] = all_objects
+    benchmarks["bilinear.pixel_gradient[16]"] = lambda: bilinear_scene.generate_pixel_gradient(None, BILINEAR_COLORS, [np.array([x, y, 0]) for y in [2.25, 0] for x in [0, 2.25]], 16)
+    benchmarks["bilinear.texel_centers[4x3]"] = lambda: bilinear_scene.generate_texel_centers(None, 4, 3)
+    benchmarks["matrix_reading_order.generate_object"] = lambda: matrix_reading_order_scene.generate_object(None)
+    for resolution in [(101, 51), (201, 101)]:
+        sphere = Sphere(radius=1, resolution=resolution)
+        size = f"{resolution[0]}x{resolution[1]}"
+        benchmarks[f"cubify[python, {size}]"] = lambda sphere=sphere: sphere.copy().apply_points_function_about_point(lambda p: cubify_loop(p, 0.65))
+        benchmarks[f"cubify[numpy, {size}]"] = lambda sphere=sphere: sphere.copy().apply_points_function_about_point(lambda p: point_transforms.cubify(p, 0.65))
+        benchmarks[f"cubify[numpy family, {size}]"] = lambda sphere=sphere: point_transforms.apply_to_family(sphere.copy(), lambda p: point_transforms.cubify(p, 0.65))
+        benchmarks[f"projection[python, {size}]"] = lambda sphere=sphere: sphere.copy().apply_function(lambda p: point_transforms.apply_homogeneous(p[None], PROJECTION_MATRIX)[0])
+        benchmarks[f"projection[numpy family, {size}]"] = lambda sphere=sphere: ApplyHomogeneousMatrix(PROJECTION_MATRIX, sphere.copy()).create_target()
+    for size in [16, 64]:
+        texture = texture_coordinates_scene.generate_texture(None, random_pattern(size), TEXTURE_COLOR_MAP)
+        for square in texture:
+            square.save_state()
+        buffer = point_transforms.PointBuffer(texture)
+        benchmarks[f"texture_warp[python, {size}x{size}]"] = lambda texture=texture: [warp_square_loop(j, WARP_MATRIX) for j in texture]
+        benchmarks[f"texture_warp[numpy buffer, {size}x{size}]"] = lambda buffer=buffer: buffer.apply_affine(WARP_MATRIX, LEFT, RIGHT)
+
+        # One frame of a wait, where none of the six control points move
+        control_points = [Dot() for _ in range(6)]
+        always_warped = Group().add_updater(lambda m, buffer=buffer: buffer.apply_affine(WARP_MATRIX, LEFT, RIGHT))
+        dependent_warped = add_dependent_updater(Group(), lambda m, buffer=buffer: buffer.apply_affine(WARP_MATRIX, LEFT, RIGHT), control_points)
+        benchmarks[f"idle_warp_updater[always, {size}x{size}]"] = lambda always_warped=always_warped: always_warped.update(0)
+        benchmarks[f"idle_warp_updater[dependent, {size}x{size}]"] = lambda dependent_warped=dependent_warped: dependent_warped.update(0)
+    bilinear_texels = np.array([[color_to_rgb(j) for j in row] for row in BILINEAR_COLORS])
+    for count in SAMPLE_COUNTS:
+        coordinates = random_coordinates(count, (4, 3))
+        benchmarks[f"sample_bilinear[python, {count}]"] = lambda coordinates=coordinates: sample_bilinear_loop(BILINEAR_COLORS, coordinates)
+        for filter in sampling.FILTERS:
+            for wrap in sampling.WRAP_MODES:
+                benchmarks[f"sample_{filter}[numpy {wrap}, {count}]"] = lambda coordinates=coordinates, filter=filter, wrap=wrap: sampling.sample(bilinear_texels, coordinates, filter, wrap)
+    mona_lisa = np.asarray(Image.open(f"{DIRECTORY}/assets/mona_lisa_big.png").convert("RGBA"))
+    for count in SAMPLE_COUNTS:
+        coordinates = random_coordinates(count, mona_lisa.shape[1::-1])
+        benchmarks[f"sample_bilinear[numpy mona lisa, {count}]"] = lambda coordinates=coordinates: sampling.sample_bilinear(mona_lisa, coordinates)
+    return benchmarks
+
+def print_throughput(results):
+    # Samples per second of every sampler benchmark
+    for name, result in results.items():
+        match = re.match(r"sample_\w+\[.*, (\d+)\]", name)
+        if match:
+            print(f"  {name:<45} {int(match.group(1)) / max(result['best'], 1e-12) / 1e6:>9.2f} Msamples/s")
+
+def print_speedups(results):
+    # Compare every "[numpy...]" benchmark with its "[python...]" counterpart
+    for name, result in results.items():
+        match = re.match(r"(.*)\[numpy[^,]*, (.*)\]", name)
+        if match and f"{match.group(1)}[python, {match.group(2)}]" in results:
+            python_result = results[f"{match.group(1)}[python, {match.group(2)}]"]
+            print(f"  {name:<45} {python_result['best'] / max(result['best'], 1e-12):>9.1f}x faster than python")
+
+def get_scaling_benchmarks():
+    # Every entry maps a knob value to (element count, builder), with the scene's own size first
+    scene = create_scene()
+    bilinear_scene = load_scene_class(f"{DIRECTORY}/bilinear_interpolation_scene.py")
+    texture_coordinates_scene = load_scene_class(f"{DIRECTORY}/texture_coordinates_scene.py")
+    reflection_ray_scene = load_scene_class(f"{DIRECTORY}/reflection_ray_scene.py")
+    matrix_reading_order_scene = load_scene_class(f"{DIRECTORY}/matrix_reading_order_scene.py")
+
+    def regular_polygon(edges):
+        return [(8 + 8 * cos(2 * pi * i / edges), 8 + 8 * sin(2 * pi * i / edges)) for i in range(edges)]
+
+    corner_pos = [np.array([x, y, 0]) for y in [2.25, 0] for x in [0, 2.25]]
+    return {
+        "bilinear.pixel_gradient": {
+            resolution: (resolution ** 2, lambda resolution=resolution: bilinear_scene.generate_pixel_gradient(None, BILINEAR_COLORS, corner_pos, resolution))
+            for resolution in [16, 32, 64, 128]
+        },
+        "pixel_grid": {
+            resolution: (resolution ** 2, lambda resolution=resolution: PixelGrid(np.random.default_rng(resolution).random((resolution, resolution, 3)), (corner_pos[1] - corner_pos[0])[0] / resolution))
+            for resolution in [16, 32, 64, 128]
+        },
+        "texture_coordinates.texture": {
+            size: (size ** 2, lambda size=size: texture_coordinates_scene.generate_texture(None, random_pattern(size), TEXTURE_COLOR_MAP))
+            for size in [16, 32, 64, 128]
+        },
+        "generate_grid": {
+            size: (4 * size, lambda size=size: scene.generate_grid(((-size, size), (-size, size))))
+            for size in [5, 25, 100, 400]
+        },
+        "reflection_ray.mirror": {
+            iterations: (iterations, lambda iterations=iterations: reflection_ray_scene.generate_mirror(None, iterations))
+            for iterations in [15, 150, 1500, 15000]
+        },
+        "matrix_reading_order.edges": {
+            edges: (edges, lambda edges=edges: matrix_reading_order_scene.generate_edges(None, regular_polygon(edges)))
+            for edges in [37, 370, 3700, 37000]
+        },
+    }
+
+def measure_scaling(builder, repeat=SCALING_REPEAT):
+    camera = CGScene().renderer.camera
+    build_times = []
+    render_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        mobject = builder()
+        build_time = time.perf_counter() - start_time
+
+        # Rasterize a single frame, without writing it anywhere
+        start_time = time.perf_counter()
+        camera.capture_mobjects(mobject.family_members_with_points())
+        render_time = time.perf_counter() - start_time
+        camera.reset()
+
+        build_times.append(build_time)
+        render_times.append(render_time)
+
+    # tracemalloc slows down every allocation, so memory gets its own pass that is not timed
+    tracemalloc.start()
+    mobject = builder()
+    camera.capture_mobjects(mobject.family_members_with_points())
+    camera.reset()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "build": min(build_times),
+        "render": min(render_times),
+        "peak_memory": peak_memory,
+    }
+
+def get_exponent(a, b, key):
+    # Slope on a log-log plot, 1 means linear growth and 2 quadratic growth
+    if a[key] <= 0 or b[key] <= 0 or a["elements"] == b["elements"]:
+        return None
+    return log(b[key] / a[key]) / log(b["elements"] / a["elements"])
+
+def run_scaling_benchmarks(pattern=None):
+    results = {}
+    with tempconfig({"dry_run": True, "disable_caching": True, "pixel_width": 1920, "pixel_height": 1080}):
+        for name, variants in get_scaling_benchmarks().items():
+            if pattern and not re.search(pattern, name):
+                continue
+
+            print(f"  \033[1m{name}\033[0m")
+            print(f"    {'N':>8} {'elements':>10} {'build':>12} {'render':>12} {'peak memory':>14} {'build exp':>10} {'render exp':>10}")
+            results[name] = []
+            for knob, (elements, builder) in variants.items():
+                result = {"n": knob, "elements": elements, **measure_scaling(builder)}
+                exponent_texts = []
+                for key in ["build", "render"]:
+                    exponent = get_exponent(results[name][-1], result, key) if results[name] else None
+                    result[f"{key}_exponent"] = exponent
+
+                    exponent_text = "" if exponent is None else f"{exponent:.2f}"
+                    if exponent is not None and exponent > 1.5:
+                        exponent_text = f"\033[1;31m{exponent_text:>10}\033[0m"
+                    exponent_texts.append(f"{exponent_text:>10}")
+                results[name].append(result)
+
+                print(f"    {knob:>8} {elements:>10} {result['build'] * 1000:>9.1f} ms {result['render'] * 1000:>9.1f} ms {result['peak_memory'] / 2 ** 20:>11.2f} MB {' '.join(exponent_texts)}")
+    return results
+
+def run_benchmarks(pattern=None):
+    results = {}
+    with tempconfig({"dry_run": True, "disable_caching": True}):
+        for name, function in get_benchmarks().items():
+            if pattern and not re.search(pattern, name):
+                continue
+            results[name] = time_function(function)
+            print(f"  {name:<45} {results[name]['best'] * 1000:>10.3f} ms")
+    return results
+
+def compare_results(results, baseline):
+    print("\n\033[1;36mComparison with baseline\033[0m")
+    regressions = 0
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            print(f"  {name:<45} {'new':>10}")
+            continue
+
+        ratio = result["best"] / max(baseline["results"][name]["best"], 1e-12)
+        color = "\033[0m"
+        if ratio > REGRESSION_THRESHOLD:
+            color = "\033[1;31m"
+            regressions += 1
+        elif ratio < 1 / REGRESSION_THRESHOLD:
+            color = "\033[1;32m"
+        print(f"{color}  {name:<45} {ratio:>9.2f}x\033[0m")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the CGScene helpers and the mobject builders of the scenes, without rendering.")
+    parser.add_argument("pattern", nargs="?", help="only run benchmarks whose name matches this regular expression")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--scaling", action="store_true", help="also run the scene builders at growing sizes and report time and peak memory against N")
+    arguments = parser.parse_args()
+
+    if not os.path.exists(RESULTS_DIRECTORY):
+        os.makedirs(RESULTS_DIRECTORY)
+
+    print("\033[1;36mBenchmarks\033[0m")
+    output = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": run_benchmarks(arguments.pattern),
+    }
+    print_speedups(output["results"])
+    print_throughput(output["results"])
+    if arguments.scaling:
+        print("\n\033[1;36mScaling\033[0m")
+        output["scaling"] = run_scaling_benchmarks(arguments.pattern)
+
+    with open(LATEST_FILENAME, "w") as latest_file:
+        json.dump(output, latest_file, indent=4)
+
+    if arguments.save_baseline:
+        with open(BASELINE_FILENAME, "w") as baseline_file:
+            json.dump(output, baseline_file, indent=4)
+        print(f"\033[36;1mSaved baseline to {BASELINE_FILENAME}\033[0m")
+    elif os.path.exists(BASELINE_FILENAME):
+        with open(BASELINE_FILENAME) as baseline_file:
+            regressions = compare_results(output["results"], json.load(baseline_file))
+        if regressions:
+            print(f"\033[1;31m{regressions} benchmark(s) more than {REGRESSION_THRESHOLD}x slower than the baseline\033[0m")
+            exit(1)
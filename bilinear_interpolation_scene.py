@@ -1,18 +1,56 @@
 from imports import *
 from manim import *
+from sampling import bilinear_weights, sample_bilinear
 import random
 
 random.seed(4136121025)
 
+COLORS = [
+    ["#EDAE49", "#D1495B", "#D17C5B", "#EDAE49"],
+    ["#30638E", "#003D5B", "#A01347", "#D1495B"],
+    ["#00798C", "#30638E", "#00798C", "#803D93"],
+]
+
+# Interpolated versions of COLORS, 200 pixels per texel
+register_asset("4x3_texture_interpolated_clamp.png", render_interpolated_texture, COLORS, "clamp", (800, 600))
+register_asset("4x3_texture_interpolated_repeat.png", render_interpolated_texture, COLORS, "repeat", (800, 600))
+register_asset("4x3_texture_interpolated_inner.png", render_interpolated_texture, COLORS, "inner", (600, 400))
+
 class MainScene(CGScene):
+    caption_workers = 4
+    tex_workers = 4
+
     def get_title(self):
         return "Bilinear Interpolation"
 
+    def generate_texel_centers(self, width, height):
+        texel_centers = []
+        texel_center_group = Group()
+        for iy in range(height):
+            row = []
+            for ix in range(width):
+                texel_center = Circle(radius=0.05).set_fill("#FFFFFF", opacity=1).set_stroke("#FFFFFF", opacity=1).move_to((-3 + 1.5 * (ix + 0.5), 2.75 - 1.5 * (iy + 0.5), 0))
+                row.append(texel_center)
+                texel_center_group.add(texel_center)
+            texel_centers.append(row)
+        return texel_centers, texel_center_group
+
+    def generate_pixel_gradient(self, colors, corner_pos, resolution=16):
+        # Sample the centers of all pixels between the four texels in one go
+        texels = np.array([[color_to_rgb(colors[iy][ix]) for ix in range(2)] for iy in range(2)])
+        centers = (np.arange(resolution) + 0.5) / resolution
+        grid_x, grid_y = np.meshgrid(centers, centers)
+        pixel_colors = sample_bilinear(texels, np.column_stack([grid_x.ravel(), grid_y.ravel()])).reshape(resolution, resolution, 3)
+
+        # The cells exactly fill the square between the corners, wherever those have moved to
+        cell_size = (corner_pos[1] - corner_pos[0])[0] / resolution
+        pixel_grid = PixelGrid(pixel_colors, cell_size).move_to(np.mean(corner_pos, axis=0))
+        pixel_grid.set_z_index(75)
+        return pixel_grid
+
     def animate(self):
-        mona_lisa_original_texture = ImageMobject(self.get_asset("mona_lisa_small.png"))
-        mona_lisa_original_texture.set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
-        mona_lisa_detailed_texture = ImageMobject(self.get_asset("mona_lisa_big.png"))
-        mona_lisa_detailed_texture.set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
+        mona_lisa_original_texture = self.get_image("mona_lisa_small.png", max_scale=7.5, resampling="nearest")
+        mona_lisa_detailed_texture = self.get_image("mona_lisa_big.png", max_scale=3.75, resampling="nearest")
 
         self.play(
             *self.swap_caption(
@@ -93,11 +131,6 @@ class MainScene(CGScene):
             run_time=0.8
         )
 
-        COLORS = [
-            ["#EDAE49", "#D1495B", "#D17C5B", "#EDAE49"],
-            ["#30638E", "#003D5B", "#A01347", "#D1495B"],
-            ["#00798C", "#30638E", "#00798C", "#803D93"],
-        ]
         nearest_neighbor_texture = Group()
         for iy in range(3):
             for ix in range(4):
@@ -106,9 +139,9 @@ class MainScene(CGScene):
                 nearest_neighbor_texture.add(square)
         nearest_neighbor_texture.move_to((0, 0.5, 0))
 
-        interpolated_clamp_texture = ImageMobject(self.get_asset("4x3_texture_interpolated_clamp.png")).scale_to_fit_width(6).move_to(nearest_neighbor_texture)
-        interpolated_repeat_texture = ImageMobject(self.get_asset("4x3_texture_interpolated_repeat.png")).scale_to_fit_width(6).move_to(nearest_neighbor_texture)
-        interpolated_inner_texture = ImageMobject(self.get_asset("4x3_texture_interpolated_inner.png")).scale_to_fit_width(4.5).move_to(nearest_neighbor_texture)
+        interpolated_clamp_texture = self.get_image("4x3_texture_interpolated_clamp.png", width=6).move_to(nearest_neighbor_texture)
+        interpolated_repeat_texture = self.get_image("4x3_texture_interpolated_repeat.png", width=6).move_to(nearest_neighbor_texture)
+        interpolated_inner_texture = self.get_image("4x3_texture_interpolated_inner.png", width=4.5).move_to(nearest_neighbor_texture)
 
         # Show 4x3 texture
         self.play(
@@ -173,15 +206,7 @@ class MainScene(CGScene):
         )
         self.wait(2)
 
-        texel_centers = []
-        texel_center_group = Group()
-        for iy in range(3):
-            row = []
-            for ix in range(4):
-                texel_center = Circle(radius=0.05).set_fill("#FFFFFF", opacity=1).set_stroke("#FFFFFF", opacity=1).move_to((-3 + 1.5 * (ix + 0.5), 2.75 - 1.5 * (iy + 0.5), 0))
-                row.append(texel_center)
-                texel_center_group.add(texel_center)
-            texel_centers.append(row)
+        texel_centers, texel_center_group = self.generate_texel_centers(4, 3)
         self.play(
             *self.swap_caption(
                 "The first thing we will do is represent each texel as a dot in its center.",
@@ -281,29 +306,41 @@ class MainScene(CGScene):
 
         # Draw distances
         distance_group = Group(
-            Line().add_updater(
+            add_dependent_updater(
+                Line(),
                 lambda m, dt: m.put_start_and_end_on(
                     (sample_point.get_left()[0], sample_point.get_y(), 0),
                     (texel_centers[0][0].get_x(), sample_point.get_y(), 0)
-                )
+                ),
+                [sample_point, texel_centers[0][0]],
+                track_self=True
             ),
-            Line().add_updater(
+            add_dependent_updater(
+                Line(),
                 lambda m, dt: m.put_start_and_end_on(
                     (sample_point.get_right()[0], sample_point.get_y(), 0),
                     (texel_centers[0][1].get_x(), sample_point.get_y(), 0)
-                )
+                ),
+                [sample_point, texel_centers[0][1]],
+                track_self=True
             ),
-            Line().add_updater(
+            add_dependent_updater(
+                Line(),
                 lambda m, dt: m.put_start_and_end_on(
                     (sample_point.get_x(), sample_point.get_top()[1], 0),
                     (sample_point.get_x(), texel_centers[0][0].get_y(), 0)
-                )
+                ),
+                [sample_point, texel_centers[0][0]],
+                track_self=True
             ),
-            Line().add_updater(
+            add_dependent_updater(
+                Line(),
                 lambda m, dt: m.put_start_and_end_on(
                     (sample_point.get_x(), sample_point.get_bottom()[1], 0),
                     (sample_point.get_x(), texel_centers[1][0].get_y(), 0)
-                )
+                ),
+                [sample_point, texel_centers[1][0]],
+                track_self=True
             )
         )
         self.play(
@@ -367,12 +404,9 @@ class MainScene(CGScene):
             alpha = (sample_point.get_x() + offset[0] - corner_group[2].get_x()) / width
             beta = (sample_point.get_y() + offset[1] - corner_group[2].get_y()) / height
 
-            return rgb_to_color(
-                    color_to_rgb(COLORS[0][0]) * (1 - alpha) * beta * mult[0] \
-                    + color_to_rgb(COLORS[0][1]) * alpha * beta * mult[1] \
-                    + color_to_rgb(COLORS[1][0]) * (1 - alpha) * (1 - beta) * mult[2] \
-                    + color_to_rgb(COLORS[1][1]) * alpha * (1 - beta) * mult[3]
-                )
+            # Beta points up from the bottom corners, while texel rows go down
+            weights = bilinear_weights(alpha, 1 - beta)[0] * mult
+            return rgb_to_color(weights @ np.array([color_to_rgb(COLORS[iy][ix]) for iy in range(2) for ix in range(2)]))
 
         # Introduce first color
         self.add_foreground_mobjects(*corner_group, sample_point)
@@ -382,7 +416,7 @@ class MainScene(CGScene):
         )
         self.wait(0.5)
 
-        rectangle_group[1].add_updater(lambda m: rectangle_updater(1))
+        add_dependent_updater(rectangle_group[1], lambda m: rectangle_updater(1), [sample_point, corner_group[1]], track_self=True)
         self.play(
             sample_point.animate.scale(2),
             run_time=0.8
@@ -436,7 +470,7 @@ class MainScene(CGScene):
             result_formula_square.animate.set_fill(color),
             run_time=0.8
         )
-        rectangle_group[0].add_updater(lambda m: rectangle_updater(0))
+        add_dependent_updater(rectangle_group[0], lambda m: rectangle_updater(0), [sample_point, corner_group[0]], track_self=True)
         color = get_sample_point_color([1, 0, 1, 1])
         self.play(
             *move_rectangle_into_position(3),
@@ -444,7 +478,7 @@ class MainScene(CGScene):
             result_formula_square.animate.set_fill(color),
             run_time=0.8
         )
-        rectangle_group[3].add_updater(lambda m: rectangle_updater(3))
+        add_dependent_updater(rectangle_group[3], lambda m: rectangle_updater(3), [sample_point, corner_group[3]], track_self=True)
         color = get_sample_point_color([1, 1, 1, 1])
         self.play(
             *move_rectangle_into_position(2),
@@ -452,7 +486,7 @@ class MainScene(CGScene):
             result_formula_square.animate.set_fill(color),
             run_time=0.8
         )
-        rectangle_group[2].add_updater(lambda m: rectangle_updater(2))
+        add_dependent_updater(rectangle_group[2], lambda m: rectangle_updater(2), [sample_point, corner_group[2]], track_self=True)
         self.remove_foreground_mobjects(*corner_group, sample_point)
         self.wait(3)
 
@@ -587,25 +621,7 @@ class MainScene(CGScene):
         )
         self.wait(4)
 
-        stack = []
-        for iy in range(16):
-            for ix in range(16):
-                stack.append((ix, iy))
-        random.shuffle(stack)
-
-        pixel_group = Group()
-        while stack:
-            ix, iy = stack.pop()
-            alpha = (ix + 0.5) / 16
-            beta = (iy + 0.5) / 16
-
-            color = interpolate_color(interpolate_color(COLORS[0][0], COLORS[0][1], alpha), interpolate_color(COLORS[1][0], COLORS[1][1], alpha), beta)
-            corner_pos = [j.get_center() for j in corner_group]
-            position = ((1 - alpha) * corner_pos[0] + alpha * corner_pos[1]) * (1 - beta) + ((1 - alpha) * corner_pos[2] + alpha * corner_pos[3]) * beta
-
-            square = Square(0.3).set_stroke(opacity=0).set_fill(color, opacity=1).move_to(position)
-            square.set_z_index(75)
-            pixel_group.add(square)
+        pixel_group = self.generate_pixel_gradient(COLORS, [j.get_center() for j in corner_group], 16)
 
         mask_rectangle = Rectangle(BACKGROUND_COLOR, 1, 1.5).shift((-7.05, 1.65, 0)).set_stroke(opacity=0).set_fill(opacity=1)
         self.add(mask_rectangle)
@@ -631,11 +647,14 @@ class MainScene(CGScene):
             FadeIn(mask_rectangle, shift = LEFT * 1.5),
         )
         self.wait(0.5)
+
+        # Let the pixels appear one by one in a random order
+        pixel_colors = pixel_group.colors.copy()
+        pixel_order = list(range(len(pixel_colors) * len(pixel_colors[0])))
+        random.shuffle(pixel_order)
+        pixel_group.set_cell_opacity(0)
         self.play(
-            AnimationGroup(
-                *[GrowFromCenter(j) for j in pixel_group],
-                lag_ratio=0.008
-            )
+            TransformPixelColors(pixel_group, pixel_colors, order=pixel_order, lag_ratio=0.008)
         )
         self.wait(3)
 
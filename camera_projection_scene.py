@@ -1,26 +1,42 @@
 from imports import *
 from manim import *
 from math import cos, pi, sin
+from point_transforms import cubify
+
+# Cells of the image, projection and model view matrix
+MATRIX_TEMPLATES = [
+    [
+        ["k_x", "0", "0", "x_0"],
+        ["0", "k_y", "0", "y_0"],
+        ["0", "0", "1", "0"],
+        ["0", "0", "0", "1"]
+    ],
+    [
+        ["\\frac{f}{aspect}", "0", "0", "0"],
+        ["0", "f", "0", "0"],
+        ["0", "0", "\\frac{near + far}{near - far}", "\\frac{2 \cdot near \cdot far}{near - far}"],
+        ["0", "0", "-1", "0"]
+    ],
+    [
+        ["m_{00}", "m_{01}", "m_{02}", "t_0"],
+        ["m_{10}", "m_{11}", "m_{12}", "t_1"],
+        ["m_{20}", "m_{21}", "m_{22}", "t_2"],
+        ["0", "0", "0", "1"]
+    ]
+]
 
 class MainScene(CGScene):
+    caption_workers = 4
+    tex_workers = 4
+
     def get_title(self):
         return "Camera Projection"
 
-    def animate(self):
-        def cubify(points, power):
-            for i in range(points.shape[0]):
-                p = points[i]
-                factor = max([abs(j) for j in p])
-                factor = pow(factor, power)
-                if factor > 1e-6:
-                    points[i] = p / factor
-            return points
-
-        def apply_transformation(matrix, point):
-            vector = np.array([point[0], point[2], -point[1], 1])
-            result = matrix @ vector
-            return np.array([result[0] / result[3], -result[2] / result[3], result[1] / result[3]])
+    def get_tex(self):
+        # The matrix cells are built in a loop
+        return [("Tex", [f"${cell}$"], {}) for matrix in MATRIX_TEMPLATES for row in matrix for cell in row]
 
+    def animate(self):
         self.play(
             *self.swap_caption(
                 "When a camera takes a picture of a scene, each point in space is mapped to a pixel on screen.",
@@ -37,26 +53,6 @@ class MainScene(CGScene):
         )
 
         # Show matrices
-        matrix_templates = [
-            [
-                ["k_x", "0", "0", "x_0"],
-                ["0", "k_y", "0", "y_0"],
-                ["0", "0", "1", "0"],
-                ["0", "0", "0", "1"]
-            ],
-            [
-                ["\\frac{f}{aspect}", "0", "0", "0"],
-                ["0", "f", "0", "0"],
-                ["0", "0", "\\frac{near + far}{near - far}", "\\frac{2 \cdot near \cdot far}{near - far}"],
-                ["0", "0", "-1", "0"]
-            ],
-            [
-                ["m_{00}", "m_{01}", "m_{02}", "t_0"],
-                ["m_{10}", "m_{11}", "m_{12}", "t_1"],
-                ["m_{20}", "m_{21}", "m_{22}", "t_2"],
-                ["0", "0", "0", "1"]
-            ]
-        ]
         matrix_scales = {
             (1, 0, 0): 0.75,
             (1, 2, 2): 0.45,
@@ -68,7 +64,7 @@ class MainScene(CGScene):
             matrix = MobjectMatrix(
                 [
                     [
-                        Tex(f"${matrix_templates[i][y][x]}$").set_background_stroke(color=BACKGROUND_COLOR, width=3).scale(matrix_scales.get((i, y, x), 1))
+                        Tex(f"${MATRIX_TEMPLATES[i][y][x]}$").set_background_stroke(color=BACKGROUND_COLOR, width=3).scale(matrix_scales.get((i, y, x), 1))
                         for x in range(4)
                     ] for y in range(4)
                 ]
@@ -381,10 +377,7 @@ class MainScene(CGScene):
         frustrum = Cube(fill_color="#FFFF7F", stroke_width=0).set_opacity(0.25)
         frustrum.set_z_index(1)
         self.play(
-            ApplyPointwiseFunction(
-                lambda point: apply_transformation(projection_matrix_inverse, point),
-                frustrum
-            ),
+            ApplyHomogeneousMatrix(projection_matrix_inverse, frustrum),
             run_time=0
         )
         self.remove(frustrum)
@@ -427,10 +420,7 @@ class MainScene(CGScene):
             frame_center=ORIGIN,
             added_anims=[
                 FadeOut(camera_group),
-                ApplyPointwiseFunction(
-                    lambda point: apply_transformation(projection_matrix, point),
-                    to_project_group
-                ),
+                ApplyHomogeneousMatrix(projection_matrix, to_project_group),
             ],
             run_time=2.5
         )
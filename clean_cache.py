@@ -0,0 +1,180 @@
+from imports import *
+import argparse
+
+MEDIA_DIRECTORY = f"{DIRECTORY}/media"
+SEGMENT_DIRECTORY = f"{DIRECTORY}/videos/segments"
+MOVIE_EXTENSIONS = [".mp4", ".mov", ".webm"]
+
+# Folders under media/ that are reported, but only cleaned by deleting them by hand
+OTHER_CACHES = ["asset_cache", "caption_cache", "Tex", "texts", "images"]
+
+def parse_size(text):
+    # "500M", "20G" or a plain number of bytes
+    units = {"K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def format_size(size):
+    return f"{size / 2 ** 20:.1f} MB"
+
+def get_folder_size(directory):
+    size = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return size
+
+def get_partial_movie_folders():
+    # manim keeps partial movies in media/videos/<scene file>/<quality>/partial_movie_files/<scene class>
+    videos_directory = f"{MEDIA_DIRECTORY}/videos"
+    if os.path.exists(videos_directory):
+        for scene in sorted(os.listdir(videos_directory)):
+            for quality in sorted(os.listdir(f"{videos_directory}/{scene}")):
+                partial_directory = f"{videos_directory}/{scene}/{quality}/partial_movie_files"
+                if not os.path.isdir(partial_directory):
+                    continue
+                for scene_class in sorted(os.listdir(partial_directory)):
+                    yield scene, quality, f"{partial_directory}/{scene_class}"
+
+    # Segmented renders give every segment its own folder, videos/segments/<scene file>/partial_movie_files/<quality>/<segment>/<scene class>
+    if os.path.exists(SEGMENT_DIRECTORY):
+        for scene in sorted(os.listdir(SEGMENT_DIRECTORY)):
+            partial_directory = f"{SEGMENT_DIRECTORY}/{scene}/partial_movie_files"
+            if not os.path.isdir(partial_directory):
+                continue
+            for quality in sorted(os.listdir(partial_directory)):
+                for segment in sorted(os.listdir(f"{partial_directory}/{quality}")):
+                    for scene_class in sorted(os.listdir(f"{partial_directory}/{quality}/{segment}")):
+                        yield scene, quality, f"{partial_directory}/{quality}/{segment}/{scene_class}"
+
+def get_referenced_movies(folder):
+    # manim writes the partial movies it combined last to this list, which makes it the latest render of the scene,
+    # or of one segment of it
+    referenced = set()
+    list_filename = f"{folder}/partial_movie_file_list.txt"
+    if os.path.exists(list_filename):
+        with open(list_filename, encoding="utf-8") as list_file:
+            for line in list_file:
+                match = re.match(r"file '(?:file:)?(.*)'", line.strip())
+                if match:
+                    referenced.add(os.path.splitext(os.path.basename(match.group(1)))[0])
+    return referenced
+
+def collect_movies():
+    # Every cached movie by hash, with all of its copies. Hard links share their bytes, so each inode is counted once
+    movies = {}
+    index = PARTIAL_MOVIE_CACHE.read_index()
+
+    def add(hash_animation, filename, scene, quality, referenced):
+        stat = os.stat(filename)
+        movie = movies.setdefault(hash_animation, {"filenames": [], "inodes": {}, "groups": set(), "last_used": 0, "referenced": False})
+        movie["filenames"].append(filename)
+        movie["inodes"][(stat.st_dev, stat.st_ino)] = stat.st_size
+        movie["groups"].add((scene, quality))
+        # Linking a movie into a scene folder only changes the inode's ctime
+        movie["last_used"] = max(movie["last_used"], index.get(hash_animation, {}).get("last_used", 0), stat.st_mtime, stat.st_ctime)
+        movie["referenced"] |= referenced
+
+    for scene, quality, folder in get_partial_movie_folders():
+        referenced = get_referenced_movies(folder)
+        for entry in os.scandir(folder):
+            hash_animation, extension = os.path.splitext(entry.name)
+            if extension in MOVIE_EXTENSIONS:
+                add(hash_animation, entry.path, scene, quality, hash_animation in referenced)
+
+    if os.path.exists(PARTIAL_MOVIE_CACHE.directory):
+        for entry in os.scandir(PARTIAL_MOVIE_CACHE.directory):
+            hash_animation, extension = os.path.splitext(entry.name)
+            if extension in MOVIE_EXTENSIONS:
+                info = index.get(hash_animation, {})
+                add(hash_animation, entry.path, info.get("scene") or "shared", info.get("quality") or "unknown", False)
+
+    for movie in movies.values():
+        movie["bytes"] = sum(movie["inodes"].values())
+    return movies
+
+def print_report(movies):
+    print("\033[1;36mPartial movies per scene and quality\033[0m")
+    groups = {}
+    for movie in movies.values():
+        for group in movie["groups"]:
+            count, size = groups.get(group, (0, 0))
+            groups[group] = (count + 1, size + movie["bytes"])
+    for (scene, quality), (count, size) in sorted(groups.items()):
+        print(f"  {scene:<40} {quality:<16} {count:>6} movies {format_size(size):>12}")
+
+    total_size = sum(j["bytes"] for j in movies.values())
+    referenced_size = sum(j["bytes"] for j in movies.values() if j["referenced"])
+    print(f"  {'total (hard links counted once)':<57} {len(movies):>6} movies {format_size(total_size):>12}")
+    print(f"  {'referenced by the latest renders':<57} {sum(j['referenced'] for j in movies.values()):>6} movies {format_size(referenced_size):>12}")
+
+    print("\n\033[1;36mOther caches\033[0m")
+    for name in OTHER_CACHES:
+        directory = f"{MEDIA_DIRECTORY}/{name}"
+        if os.path.exists(directory):
+            print(f"  {name:<57} {format_size(get_folder_size(directory)):>19}")
+
+def select_evictions(movies, max_age=None, max_bytes=None):
+    # Oldest first. Movies of the latest renders, and movies used within the grace period, which may belong
+    # to renders still in progress, are never evicted
+    now = time.time()
+    candidates = sorted(
+        [(j["last_used"], hash_animation) for hash_animation, j in movies.items() if not j["referenced"] and now - j["last_used"] >= PARTIAL_MOVIE_CACHE.GRACE_PERIOD]
+    )
+    evictions = []
+    total_size = sum(j["bytes"] for j in movies.values())
+    for last_used, hash_animation in candidates:
+        too_old = max_age is not None and now - last_used > max_age
+        too_big = max_bytes is not None and total_size > max_bytes
+        if not too_old and not too_big:
+            continue
+        evictions.append(hash_animation)
+        total_size -= movies[hash_animation]["bytes"]
+    return evictions
+
+def evict(movies, evictions, dry_run=False):
+    evicted = 0
+    freed = 0
+    with file_lock(PARTIAL_MOVIE_CACHE.lock_filename) if os.path.exists(PARTIAL_MOVIE_CACHE.directory) else contextlib.nullcontext():
+        index = PARTIAL_MOVIE_CACHE.read_index()
+        for hash_animation in evictions:
+            movie = movies[hash_animation]
+            # Used by a render since the scan started
+            if index.get(hash_animation, {}).get("last_used", 0) > movie["last_used"]:
+                continue
+            if not dry_run:
+                for filename in movie["filenames"]:
+                    try:
+                        os.remove(filename)
+                    except OSError:
+                        pass
+                index.pop(hash_animation, None)
+            evicted += 1
+            freed += movie["bytes"]
+        if not dry_run and os.path.exists(PARTIAL_MOVIE_CACHE.directory):
+            PARTIAL_MOVIE_CACHE.write_index(index)
+    return evicted, freed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report and clean the partial movie files of manim and the shared partial movie cache.")
+    parser.add_argument("--max-age", type=float, help="evict movies not used for this many days")
+    parser.add_argument("--max-bytes", type=parse_size, help="evict the least recently used movies until the total fits, e.g. 20G")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be evicted")
+    arguments = parser.parse_args()
+
+    movies = collect_movies()
+    print_report(movies)
+
+    if arguments.max_age is None and arguments.max_bytes is None:
+        exit()
+
+    max_age = arguments.max_age * 24 * 60 * 60 if arguments.max_age is not None else None
+    evictions = select_evictions(movies, max_age, arguments.max_bytes)
+    evicted, freed = evict(movies, evictions, arguments.dry_run)
+    action = "Would evict" if arguments.dry_run else "Evicted"
+    print(f"\n\033[36;1m{action} {evicted} movies, freeing {format_size(freed)}\033[0m")
@@ -3,9 +3,33 @@ if __name__ == "__main__":
     exit()
 
 from manim import *
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import ast
+import asyncio
+import contextlib
+import csv
+import functools
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
+import manim
+import multiprocessing
 import numpy as np
 import os
+import pickle
+import re
+import shutil
+import subprocess
+import sys
+import textwrap
 import time
+import traceback
+from PIL import Image, ImageDraw
+from point_transforms import apply_homogeneous, apply_to_family, line_segments_to_points
+from sampling import resample
 
 DIRECTORY = os.path.realpath(os.path.dirname(__file__))
 BACKGROUND_COLOR = "#36393F"
@@ -13,19 +37,34 @@ BACKGROUND_COLOR = "#36393F"
 config.background_color = BACKGROUND_COLOR
 config.max_files_cached = 1000
 
-def render_video(filename, high_quality=True, start_at=0, end_at=1000):
-    command = "echo lmao"
+# Byte budget of the partial movie cache shared by all scenes and qualities
+PARTIAL_MOVIE_CACHE_BYTES = 20 * 2 ** 30
 
-    if not os.path.exists(f"{DIRECTORY}/videos"):
-        os.mkdir(f"{DIRECTORY}/videos")
+def get_scene_name(filename):
+    return os.path.basename(filename.replace("\\", "/"))[:-3]
 
-    name = filename.split("\\")[-1][:-3]
-    output_filename = f"{DIRECTORY}\\videos\\{name}.mp4"
+def get_render_arguments(filename, high_quality=True, start_at=0, end_at=1000, preview=True, output_filename=None):
+    name = get_scene_name(filename)
 
     if high_quality:
-        command = f"manim {filename} MainScene --write_to_movie --output_file {output_filename} --from_animation_number {start_at},{end_at} --resolution 1920,1080 --frame_rate 60"
+        output_filename = output_filename or f"{DIRECTORY}\\videos\\{name}.mp4"
+        return ["manim", filename, "MainScene", "--write_to_movie", "--output_file", output_filename, "--from_animation_number", f"{start_at},{end_at}", "--resolution", "1920,1080", "--frame_rate", "60"]
     else:
-        command = f"manim {filename} MainScene -p --disable_caching --from_animation_number {start_at},{end_at} --resolution 480,270 --frame_rate 5"
+        output_arguments = ["--write_to_movie", "--output_file", output_filename] if output_filename else []
+        return ["manim", filename, "MainScene", *["-p"] * preview, *output_arguments, "--from_animation_number", f"{start_at},{end_at}", "--resolution", "480,270", "--frame_rate", "5"]
+
+def render_video(filename, high_quality=True, start_at=0, end_at=1000, segments=1, keyframes=False, timeline=False):
+    if timeline:
+        return compile_timeline(filename)
+    if keyframes:
+        return render_keyframes(filename, start_at, end_at)
+    if segments > 1:
+        return render_video_segments(filename, high_quality, start_at, end_at, segments)
+
+    if not os.path.exists(f"{DIRECTORY}/videos"):
+        os.mkdir(f"{DIRECTORY}/videos")
+
+    command = " ".join(get_render_arguments(filename, high_quality, start_at, end_at))
 
     print(f"\033[0;32m{command}\033[0m")
     start_time = time.time()
@@ -34,36 +73,1372 @@ def render_video(filename, high_quality=True, start_at=0, end_at=1000):
 
     print(f"\033[36;1mTotal time: {end_time - start_time:.4} seconds\033[0m")
 
-class CGScene(ThreeDScene):
-    def get_title(self):
-        return "Untitled"
+def run_logged(label, arguments, log_filename):
+    print(f"\033[0;32m[{label}] {' '.join(arguments)}\033[0m")
+    start_time = time.time()
+    with open(log_filename, "w") as log_file:
+        return_code = subprocess.call(arguments, stdout=log_file, stderr=subprocess.STDOUT)
+    end_time = time.time()
 
-    def all_objects(self):
-        return Group(*filter(lambda x: issubclass(type(x), Mobject), self.mobjects)).remove(self.title_text)
+    status = ["\033[1;31mfailed", "\033[1;32mdone"][return_code == 0]
+    print(f"{status}\033[0m [{label}] in {end_time - start_time:.4} seconds, log at {log_filename}")
+    return return_code, end_time - start_time
 
-    def generate_grid(self, grid_range):
-        grid_group = Group()
+def render_videos(filenames, high_quality=True, workers=4):
+    log_directory = f"{DIRECTORY}/videos/logs"
+    if not os.path.exists(log_directory):
+        os.makedirs(log_directory)
+
+    def render_to_log(filename):
+        name = get_scene_name(filename)
+        arguments = get_render_arguments(filename, high_quality, preview=False)
+        return (name, *run_logged(name, arguments, f"{log_directory}/{name}.log"))
+
+    # Decode the image assets once up front, so the renders below only have to map them
+    start_time = time.time()
+    for asset in sorted(os.listdir(f"{DIRECTORY}/assets")):
+        if os.path.splitext(asset)[1].lower() in [".png", ".jpg", ".jpeg"]:
+            SHARED_IMAGES.load(f"{DIRECTORY}/assets/{asset}")
+
+    # Render scenes, at most `workers` at the same time
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(render_to_log, filenames))
+    wall_time = time.time() - start_time
+
+    # Print report
+    sequential_time = sum(j[2] for j in results)
+    print("\n\033[1;36mRender report\033[0m")
+    for name, return_code, duration in results:
+        status = [f"\033[31mfailed (exit code {return_code})", "\033[32mok"][return_code == 0]
+        print(f"  {name:<40} {duration:>9.2f} s  {status}\033[0m")
+    print(f"\033[36;1mWall time: {wall_time:.4} seconds, sequential time: {sequential_time:.4} seconds, speedup: {sequential_time / max(wall_time, 1e-9):.3}x\033[0m")
+
+    return results
+
+def count_frames(filename):
+    arguments = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-count_packets", "-show_entries", "stream=nb_read_packets", "-of", "csv=p=0", filename]
+    return int(subprocess.run(arguments, capture_output=True, text=True, check=True).stdout.strip())
+
+def get_animation_frames(run_time, static, frame_rate):
+    # The frames manim writes for one animation: a static wait repeats a frozen frame, anything else is sampled every 1 / frame_rate seconds
+    if static:
+        return int(run_time / (1 / frame_rate))
+    return len(np.arange(0, run_time, 1 / frame_rate))
+
+def split_animation_range(start_at, end_at, segments):
+    # Split the inclusive range [start_at, end_at] into at most `segments` consecutive ranges
+    count = end_at - start_at + 1
+    segments = max(1, min(segments, count))
+    bounds = [start_at + count * i // segments for i in range(segments + 1)]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(segments)]
+
+def render_video_segments(filename, high_quality=True, start_at=0, end_at=1000, segments=4):
+    name = get_scene_name(filename)
+    segment_directory = f"{DIRECTORY}/videos/segments/{name}"
+    if not os.path.exists(segment_directory):
+        os.makedirs(segment_directory)
+
+    # The timeline has the number of animations and the run time of each, which gives the frames every segment should have
+    start_time = time.time()
+    timeline = compile_timeline(filename, f"{segment_directory}/timeline.json")
+    frame_rate = get_render_config(filename, high_quality)["frame_rate"]
+    end_at = min(end_at, timeline["animations"] - 1)
+    ranges = split_animation_range(start_at, end_at, segments)
+
+    def render_segment(i):
+        segment_filename = f"{segment_directory}/{i:03}.mp4"
+        if os.path.exists(segment_filename):
+            os.remove(segment_filename)
+
+        # Every segment gets its own partial movie folder, since manim rewrites the file list and cleans the folder after each render.
+        # They still share movies through the partial movie cache
+        config_filename = f"{segment_directory}/{i:03}.cfg"
+        with open(config_filename, "w") as config_file:
+            config_file.write(f"[CLI]\npartial_movie_dir = {segment_directory}/partial_movie_files/{{quality}}/{i:03}/{{scene_name}}\n")
+
+        arguments = get_render_arguments(filename, high_quality, *ranges[i], preview=False, output_filename=segment_filename) + ["--config_file", config_filename]
+        return_code, duration = run_logged(f"{name} {ranges[i][0]}-{ranges[i][1]}", arguments, f"{segment_directory}/{i:03}.log")
+        if return_code != 0 or not os.path.exists(segment_filename):
+            raise RuntimeError(f"Segment {i} ({ranges[i][0]}-{ranges[i][1]}) of {name} failed, see {segment_directory}/{i:03}.log")
+        return segment_filename
+
+    # Render all segments in parallel
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        segment_filenames = list(executor.map(render_segment, range(len(ranges))))
+
+    # Concatenate segments without re-encoding
+    list_filename = f"{segment_directory}/segments.txt"
+    with open(list_filename, "w") as list_file:
+        for segment_filename in segment_filenames:
+            list_file.write(f"file '{segment_filename}'\n")
+    output_filename = f"{DIRECTORY}/videos/{name}.mp4"
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_filename, "-c", "copy", output_filename], check=True)
+
+    # Verify that every segment has the frames of its animations, so none were lost or duplicated at the joins
+    errors = []
+    frame = 0
+    for i, (segment_start, segment_end) in enumerate(ranges):
+        expected_frames = sum(get_animation_frames(j["run_time"], j["static"], frame_rate) for j in timeline["entries"] if segment_start <= j["animation_number"] <= segment_end)
+        frames = count_frames(segment_filenames[i])
+        status = ["\033[31m", "\033[32m"][frames == expected_frames]
+        print(f"  animations {segment_start:>4}-{segment_end:<4} frames {frame:>6}-{frame + frames - 1:<6} {status}{frames} of {expected_frames} expected\033[0m")
+        if frames != expected_frames:
+            errors.append(f"segment {i} ({segment_start}-{segment_end}) has {frames} frames instead of {expected_frames}")
+        frame += frames
+    total_frames = count_frames(output_filename)
+    if total_frames != frame:
+        errors.append(f"the concatenated video has {total_frames} frames, but the segments have {frame} frames in total")
+    if errors:
+        raise RuntimeError(f"Rendering {name} in segments went wrong: {'; '.join(errors)}")
+
+    end_time = time.time()
+    print(f"\033[36;1mTotal time: {end_time - start_time:.4} seconds ({len(ranges)} segments, {total_frames} frames)\033[0m")
+    return output_filename
+
+def capture_keyframes(filename, start_at, end_at, directory):
+    # Skip through the scene without rendering any animation, saving the frame at the end of each one in the range
+    with tempconfig({"input_file": filename, "dry_run": True, "disable_caching": True, "upto_animation_number": end_at, "pixel_width": 480, "pixel_height": 270, "frame_rate": 5}):
+        scene = load_scene_class(filename)(skip_animations=True)
+        scene.keyframe_directory = directory
+        scene.keyframe_range = (start_at, end_at)
+        scene.render()
+        return scene.keyframes
+
+def build_contact_sheet(keyframes, filename, columns=4):
+    # Thumbnails of every keyframe, labelled with their animation number and caption
+    thumbnails = [Image.open(j["filename"]).convert("RGB") for j in keyframes]
+    width, height = thumbnails[0].size
+    label_height = 44
+    rows = (len(thumbnails) + columns - 1) // columns
+    sheet = Image.new("RGB", (columns * width, rows * (height + label_height)), BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(sheet)
+
+    for i, (keyframe, thumbnail) in enumerate(zip(keyframes, thumbnails)):
+        x = (i % columns) * width
+        y = (i // columns) * (height + label_height)
+        sheet.paste(thumbnail, (x, y))
+        draw.text((x + 6, y + height + 4), f"#{keyframe['animation_number']} {keyframe['kind']}", fill="#FFFF00")
+        for j, line in enumerate(textwrap.wrap(keyframe["caption"], 75)[:2]):
+            draw.text((x + 6, y + height + 17 + 12 * j), line, fill="#FFFFFF")
+    sheet.save(filename)
+
+def render_keyframes(filename, start_at=0, end_at=1000, workers=4):
+    # Save the last frame of every animation and a contact sheet of all of them, instead of rendering a video
+    name = get_scene_name(filename)
+    keyframe_directory = f"{DIRECTORY}/videos/keyframes/{name}"
+    if os.path.exists(keyframe_directory):
+        shutil.rmtree(keyframe_directory)
+    os.makedirs(keyframe_directory)
+
+    # Every worker skips through the animations before its range, which is cheap compared to rendering them
+    start_time = time.time()
+    if workers > 1:
+        end_at = min(end_at, compile_timeline(filename, f"{keyframe_directory}/timeline.json")["animations"] - 1)
+    ranges = split_animation_range(start_at, end_at, workers)
+    with get_render_executor(len(ranges)) as executor:
+        futures = [executor.submit(capture_keyframes, filename, j[0], j[1], keyframe_directory) for j in ranges]
+        keyframes = [keyframe for future in futures for keyframe in future.result()]
+    if not keyframes:
+        print(f"\033[1;31mNo animations between {start_at} and {end_at}\033[0m")
+        return None
+
+    sheet_filename = f"{DIRECTORY}/videos/{name}_contact_sheet.png"
+    build_contact_sheet(keyframes, sheet_filename)
+    end_time = time.time()
+    print(f"\033[36;1mSaved {len(keyframes)} keyframes to {keyframe_directory} and a contact sheet to {sheet_filename} in {end_time - start_time:.4} seconds\033[0m")
+    return sheet_filename
+
+def compile_timeline(filename, output_filename=None):
+    # Run the scene with every animation skipped, and write its timeline without rasterizing a single frame
+    name = get_scene_name(filename)
+    output_filename = output_filename or f"{DIRECTORY}/videos/{name}_timeline.json"
+    if not os.path.exists(os.path.dirname(output_filename)):
+        os.makedirs(os.path.dirname(output_filename))
+
+    start_time = time.time()
+    with tempconfig({"input_file": filename, "dry_run": True, "disable_caching": True, "pixel_width": 480, "pixel_height": 270, "frame_rate": 5}):
+        scene = load_scene_class(filename)(skip_animations=True)
+        scene.render()
+
+    entries = []
+    for timing in scene.animation_timings:
+        entries.append({
+            "animation_number": timing["animation_number"],
+            "kind": timing["kind"],
+            "start_time": timing["start_time"],
+            "run_time": timing["run_time"],
+            "static": timing["static"],
+            "waits": 0,
+            "caption": timing["caption"],
+            "line": timing["line"],
+        })
+
+    # The waits after a play or camera move count towards it
+    last_entry = None
+    for entry in entries:
+        if entry["kind"] != "wait":
+            last_entry = entry
+        elif last_entry is not None:
+            last_entry["waits"] += entry["run_time"]
+
+    captions = []
+    for entry in entries:
+        if entry["caption"] and (not captions or captions[-1]["text"] != entry["caption"]):
+            captions.append({"start_time": entry["start_time"], "animation_number": entry["animation_number"], "text": entry["caption"]})
+
+    duration = sum(j["run_time"] for j in entries)
+    end_time = time.time()
+    timeline = {
+        "scene": name,
+        "duration": duration,
+        "animations": len(entries),
+        "compile_time": end_time - start_time,
+        "entries": entries,
+        "captions": captions,
+    }
+    with open(output_filename, "w") as timeline_file:
+        json.dump(timeline, timeline_file, indent=4)
+
+    print(f"\033[36;1m{name}: {len(entries)} animations, {int(duration // 60)}:{duration % 60:04.1f} long, {len(captions)} captions, compiled in {end_time - start_time:.4} seconds\033[0m")
+    print(f"\033[36;1mSaved timeline to {output_filename}\033[0m")
+    return timeline
+
+class RenderResult:
+    def __init__(self, filename, exit_status, output_path, wall_time, frames, bytes_written, output):
+        self.filename = filename
+        self.exit_status = exit_status
+        self.output_path = output_path
+        self.wall_time = wall_time
+        self.frames = frames
+        self.bytes_written = bytes_written
+        self.output = output
+
+    @property
+    def ok(self):
+        return self.exit_status == 0
+
+    def __repr__(self):
+        return f"RenderResult({get_scene_name(self.filename)}, exit_status={self.exit_status}, wall_time={self.wall_time:.4}, frames={self.frames}, bytes_written={self.bytes_written})"
+
+def get_render_config(filename, high_quality=True, start_at=0, end_at=1000, output_filename=None):
+    name = get_scene_name(filename)
+
+    if high_quality:
+        return {
+            "input_file": filename,
+            "output_file": output_filename or f"{DIRECTORY}/videos/{name}.mp4",
+            "write_to_movie": True,
+            "from_animation_number": start_at,
+            "upto_animation_number": end_at,
+            "pixel_width": 1920,
+            "pixel_height": 1080,
+            "frame_rate": 60,
+        }
+    else:
+        return {
+            "input_file": filename,
+            "output_file": output_filename or f"{DIRECTORY}/videos/{name}_preview.mp4",
+            "write_to_movie": True,
+            "from_animation_number": start_at,
+            "upto_animation_number": end_at,
+            "pixel_width": 480,
+            "pixel_height": 270,
+            "frame_rate": 5,
+        }
+
+def load_scene_class(filename, scene_name="MainScene"):
+    spec = importlib.util.spec_from_file_location(get_scene_name(filename), filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, scene_name)
+
+def render_scene(filename, high_quality=True, start_at=0, end_at=1000, output_filename=None):
+    # Renders in this process; use submit_render to run renders concurrently
+    if not os.path.exists(f"{DIRECTORY}/videos"):
+        os.mkdir(f"{DIRECTORY}/videos")
+
+    exit_status = 0
+    output_path = None
+    frames = 0
+    bytes_written = 0
+    # manim logs to stdout through rich, tracebacks go to stderr
+    output = io.StringIO()
+
+    start_time = time.time()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            with tempconfig(get_render_config(filename, high_quality, start_at, end_at, output_filename)):
+                scene = load_scene_class(filename)()
+                scene.render()
+                output_path = str(scene.renderer.file_writer.movie_file_path)
+
+            # Count the frames of the final movie, since animations reused from cached partial movies never pass through write_frame
+            frames = count_frames(output_path)
+            bytes_written = os.path.getsize(output_path)
+        except Exception:
+            exit_status = 1
+            traceback.print_exc()
+    end_time = time.time()
+
+    return RenderResult(filename, exit_status, output_path, end_time - start_time, frames, bytes_written, output.getvalue())
+
+def get_render_executor(workers=4):
+    # manim's config is global, so concurrent renders need their own processes
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+
+def submit_render(executor, filename, high_quality=True, start_at=0, end_at=1000, output_filename=None):
+    return executor.submit(render_scene, filename, high_quality, start_at, end_at, output_filename)
+
+async def render_scene_async(executor, filename, high_quality=True, start_at=0, end_at=1000, output_filename=None):
+    return await asyncio.wrap_future(submit_render(executor, filename, high_quality, start_at, end_at, output_filename))
+
+def build_caption(text, t2c, t2s, scale):
+    caption = Text(text, t2s=t2s).set_color("#FFFFFF")
+    caption.scale(scale)
+    caption._set_color_by_t2c(t2c)
+    caption.set_z_index(1000)
+    caption.add_background_rectangle("#000000", 0.5, buff=0.2, corner_radius=0.2)
+    caption.background_rectangle.set_z_index(999)
+    return caption
+
+class CaptionCache:
+    VERSION = 1
+
+    def __init__(self, directory, max_size=128):
+        self.directory = directory
+        self.max_size = max_size
+        self.captions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, text, t2c, t2s, scale):
+        key = repr((self.VERSION, manim.__version__, text, sorted(t2c.items()), sorted(t2s.items()), scale))
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        filename = f"{self.directory}/{key}.pickle"
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, "rb") as caption_file:
+                return pickle.load(caption_file)
+        except Exception:
+            return None
+
+    def store(self, key, caption):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        # Write to a temporary file first, so concurrent renders never read half a caption
+        filename = f"{self.directory}/{key}.pickle"
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_filename, "wb") as caption_file:
+                pickle.dump(caption, caption_file)
+            os.replace(temporary_filename, filename)
+        except Exception:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+
+    def is_cached(self, text, t2c, t2s, scale):
+        key = self.get_key(text, t2c, t2s, scale)
+        return key in self.captions or os.path.exists(f"{self.directory}/{key}.pickle")
+
+    def lookup(self, text, t2c, t2s, scale):
+        key = self.get_key(text, t2c, t2s, scale)
+
+        caption = self.captions.get(key)
+        if caption is None:
+            caption = self.load(key)
+            if caption is None:
+                self.misses += 1
+                caption = build_caption(text, t2c, t2s, scale)
+                self.store(key, caption)
+            else:
+                self.hits += 1
+            self.captions[key] = caption
+        else:
+            self.hits += 1
+
+        # Evict least recently used captions
+        self.captions.move_to_end(key)
+        while len(self.captions) > self.max_size:
+            self.captions.popitem(last=False)
+
+        return caption
+
+    def get(self, text, t2c, t2s, scale):
+        return self.lookup(text, t2c, t2s, scale).copy()
+
+CAPTION_CACHE = CaptionCache(f"{DIRECTORY}/media/caption_cache")
+
+def wrap_caption(text):
+    # Group text in new lines
+    texts = text.split()
+    final_text = ""
+    line_length = 0
+    for t in texts:
+        if line_length + 1 + len(t) <= 60:
+            final_text += " " + t
+            line_length += 1 + len(t)
+        else:
+            final_text += "\n" + t
+            line_length = len(t)
+    return final_text[1:]
+
+def find_constant_calls(filename, names, keywords=None):
+    # The calls to the functions or methods in `names` whose arguments can be evaluated without running the scene,
+    # only looking at the given keyword arguments if `keywords` is set. Calls that need local names of the scene are
+    # returned separately, as (name, line)
+    with open(filename, encoding="utf-8") as scene_file:
+        tree = ast.parse(scene_file.read(), filename)
+    namespace = vars(manim)
+
+    def evaluate(node):
+        return eval(compile(ast.Expression(node), filename, "eval"), {"__builtins__": {}}, namespace)
+
+    calls = []
+    skipped = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        function = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+        if function not in names:
+            continue
+        try:
+            args = [evaluate(j) for j in node.args]
+            kwargs = {j.arg: evaluate(j.value) for j in node.keywords if j.arg is not None and (keywords is None or j.arg in keywords)}
+        except Exception:
+            skipped.append((function, node.lineno))
+            continue
+        calls.append((function, node.lineno, args, kwargs))
+    return sorted(calls, key=lambda j: j[1]), sorted(skipped, key=lambda j: j[1])
+
+def find_captions(filename):
+    # Collect the swap_caption calls whose arguments can be evaluated without running the scene
+    calls, skipped = find_constant_calls(filename, ["swap_caption"], ["t2c", "t2s", "scale"])
+    captions = []
+    for function, line, args, kwargs in calls:
+        if args and isinstance(args[0], str):
+            captions.append((wrap_caption(args[0]), kwargs.get("t2c", {}), kwargs.get("t2s", {}), kwargs.get("scale", 0.7)))
+    return captions, skipped
+
+def prepare_caption(caption):
+    CAPTION_CACHE.lookup(*caption)
+
+def prepare_captions(filename, workers=4):
+    # Build the captions a scene will show in parallel, before any frame is rendered
+    start_time = time.time()
+    captions, skipped = find_captions(filename)
+    missing = [j for j in captions if not CAPTION_CACHE.is_cached(*j)]
+    if missing:
+        with get_render_executor(workers) as executor:
+            list(executor.map(prepare_caption, missing))
+
+    # Load them into memory, so swap_caption only has to copy them
+    for caption in captions:
+        CAPTION_CACHE.lookup(*caption)
+
+    end_time = time.time()
+    print(f"\033[36;1mPrepared {len(captions)} captions ({len(missing)} built) in {end_time - start_time:.4} seconds\033[0m")
+    if skipped:
+        print(f"\033[33mBuilt on demand, since they depend on the scene: {', '.join(f'caption at line {line}' for function, line in skipped)}\033[0m")
+
+def render_interpolated_texture(colors, wrap, size):
+    # One texel per entry of `colors`, bilinearly interpolated to size = (width, height) pixels
+    texels = to_rgba_array(colors)[:, :, :3] * 255
+    return np.round(resample(texels, size, "bilinear", wrap)).astype(np.uint8)
+
+class ProceduralAssetCache:
+    # Assets generated from code, stored under a hash of their recipe and its arguments.
+    # Changing the arguments of one asset only rebuilds that asset, unchanged ones are never recomputed.
+    VERSION = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.recipes = {}
+        self.filenames = {}
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, filename, recipe, *arguments):
+        self.recipes[filename] = (recipe, arguments)
+        self.filenames.pop(filename, None)
+
+    def is_procedural(self, filename):
+        return filename in self.recipes
+
+    def get_source(self, value):
+        try:
+            return inspect.getsource(value)
+        except (OSError, TypeError):
+            return getattr(value, "__qualname__", repr(value))
+
+    def get_sources(self, recipe):
+        # The recipe and the functions it calls: helpers next to the recipe by their source, and functions imported from
+        # other modules of this repository, like sampling.resample, by the source of their whole module
+        sources = [self.get_source(recipe)]
+        code = getattr(recipe, "__code__", None)
+        for name in code.co_names if code else []:
+            value = getattr(recipe, "__globals__", {}).get(name)
+            if not inspect.isfunction(value):
+                continue
+            if value.__module__ == recipe.__module__:
+                sources.append(self.get_source(value))
+                continue
+            module = inspect.getmodule(value)
+            module_filename = getattr(module, "__file__", None)
+            if module_filename and os.path.dirname(os.path.realpath(module_filename)) == DIRECTORY:
+                sources.append(self.get_source(module))
+        return sources
+
+    def get_key(self, filename):
+        recipe, arguments = self.recipes[filename]
+        # manim converts the colors, so its version is part of the key as well
+        key = repr((self.VERSION, manim.__version__, filename, self.get_sources(recipe), arguments))
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_filename(self, filename):
+        stem, extension = os.path.splitext(filename)
+        return f"{self.directory}/{stem}_{self.get_key(filename)[:16]}{extension}"
+
+    def build(self, filename, cached_filename):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        # Write to a temporary file first, so concurrent renders never read half an image
+        recipe, arguments = self.recipes[filename]
+        extension = os.path.splitext(filename)[1]
+        temporary_filename = f"{cached_filename}.{os.getpid()}.tmp{extension}"
+        try:
+            Image.fromarray(recipe(*arguments)).save(temporary_filename)
+            os.replace(temporary_filename, cached_filename)
+        finally:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+
+    def get(self, filename):
+        cached_filename = self.filenames.get(filename)
+        if cached_filename is None:
+            cached_filename = self.get_filename(filename)
+            self.filenames[filename] = cached_filename
+
+        if os.path.exists(cached_filename):
+            self.hits += 1
+        else:
+            self.misses += 1
+            start_time = time.time()
+            self.build(filename, cached_filename)
+            end_time = time.time()
+            print(f"\033[36;1mGenerated {filename} in {end_time - start_time:.4} seconds\033[0m")
+        return cached_filename
+
+ASSET_CACHE = ProceduralAssetCache(f"{DIRECTORY}/media/asset_cache")
+
+def register_asset(filename, recipe, *arguments):
+    # Let CGScene.get_asset(filename) return the output of recipe(*arguments) instead of a file in assets/
+    ASSET_CACHE.register(filename, recipe, *arguments)
+
+class MipmapCache:
+    # Halved copies of image assets, so renders can load the smallest level that still has a texel per output pixel.
+    # Levels of pixel art are decimated instead of averaged, so "nearest" resampling keeps showing the original colors.
+    VERSION = 1
+    MIN_SIZE = 8
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.levels = {}
+
+    def get_level_sizes(self, size):
+        sizes = [size]
+        while min(sizes[-1]) // 2 >= self.MIN_SIZE:
+            sizes.append((sizes[-1][0] // 2, sizes[-1][1] // 2))
+        return sizes
+
+    def get_levels(self, filename, resampling="bilinear"):
+        # The (filename, size) of every level, largest first, named after a hash of the source image
+        key = (filename, resampling)
+        if key not in self.levels:
+            with open(filename, "rb") as image_file:
+                digest = hashlib.sha256(image_file.read()).hexdigest()[:16]
+            with Image.open(filename) as image:
+                size = image.size
+            stem = os.path.splitext(os.path.basename(filename))[0]
+            levels = [(filename, size)]
+            for i, level_size in enumerate(self.get_level_sizes(size)[1:], 1):
+                levels.append((f"{self.directory}/{stem}_{digest}_v{self.VERSION}_{resampling}_{i}.png", level_size))
+            self.levels[key] = levels
+        return self.levels[key]
 
-        # Place horizontal grid lines
-        for iy in range(grid_range[1][0] + 1, grid_range[1][1]):
-            if iy == 0:
+    def build(self, filename, resampling):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        levels = self.get_levels(filename, resampling)
+        image = Image.open(filename)
+        for level_filename, level_size in levels[1:]:
+            # Every level is made from the previous one, which is cheaper and averages 2x2 blocks exactly
+            image = image.resize(level_size, Image.NEAREST if resampling == "nearest" else Image.BOX)
+            if os.path.exists(level_filename):
                 continue
-            new_line = Line(np.array([grid_range[0][0], iy, 0]), np.array([grid_range[0][1], iy, 0]), color="#5F5F5F")
-            grid_group.add(new_line)
+            temporary_filename = f"{level_filename}.{os.getpid()}.tmp.png"
+            try:
+                image.save(temporary_filename)
+                os.replace(temporary_filename, level_filename)
+            finally:
+                if os.path.exists(temporary_filename):
+                    os.remove(temporary_filename)
+
+    def get(self, filename, pixel_width, pixel_height, resampling="bilinear"):
+        # The smallest level that still covers pixel_width x pixel_height output pixels
+        levels = self.get_levels(filename, resampling)
+        level_filename = levels[0][0]
+        for candidate_filename, candidate_size in levels[1:]:
+            if candidate_size[0] < pixel_width or candidate_size[1] < pixel_height:
+                break
+            level_filename = candidate_filename
+
+        if not os.path.exists(level_filename):
+            self.build(filename, resampling)
+        return level_filename
+
+MIPMAP_CACHE = MipmapCache(f"{DIRECTORY}/media/asset_cache/mipmaps")
+
+class SharedImageCache:
+    # Decoded RGBA pixels of image assets, stored as .npy files that every render maps into memory.
+    # Concurrent renders share the pages of one file instead of decoding their own copy, and repeat runs skip decoding.
+    # The maps are copy-on-write, so manim can still change an image's opacity in place without touching the file.
+    VERSION = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_filename = f"{directory}/index.json"
+        self.arrays = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, filename):
+        # Keyed by path and modification, so an edited asset is decoded again
+        stat = os.stat(filename)
+        key = repr((self.VERSION, os.path.realpath(filename), stat.st_mtime_ns, stat.st_size))
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def read_index(self):
+        try:
+            with open(self.index_filename) as index_file:
+                return json.load(index_file)
+        except Exception:
+            return {}
+
+    def update_index(self, filename, array_filename, shape):
+        # Re-read right before replacing it, so entries written by other renders in the meantime are kept
+        index = self.read_index()
+        index[os.path.realpath(filename)] = {
+            "array": os.path.basename(array_filename),
+            "shape": list(shape),
+            "bytes": os.path.getsize(array_filename),
+            "created": time.time(),
+        }
+        temporary_filename = f"{self.index_filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "w") as index_file:
+            json.dump(index, index_file, indent=4)
+        os.replace(temporary_filename, self.index_filename)
+
+    def decode(self, filename, array_filename):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        with Image.open(filename) as image:
+            pixel_array = np.array(image.convert("RGBA"))
+        temporary_filename = f"{array_filename}.{os.getpid()}.tmp.npy"
+        try:
+            np.save(temporary_filename, pixel_array)
+            os.replace(temporary_filename, array_filename)
+        finally:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+        self.update_index(filename, array_filename, pixel_array.shape)
+
+    def load(self, filename):
+        key = self.get_key(filename)
+        if key in self.arrays:
+            self.hits += 1
+            return self.arrays[key]
+
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        array_filename = f"{self.directory}/{stem}_{key}.npy"
+        if os.path.exists(array_filename):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.decode(filename, array_filename)
+        self.arrays[key] = np.load(array_filename, mmap_mode="c")
+        return self.arrays[key]
+
+SHARED_IMAGES = SharedImageCache(f"{DIRECTORY}/media/asset_cache/shared")
+
+def shared_image_mobject(filename):
+    # ImageMobject copies any array it is given, so build it from a placeholder and hand it the mapped pixels afterwards
+    image = ImageMobject(np.zeros((1, 1, 4), dtype=np.uint8))
+    image.pixel_array = SHARED_IMAGES.load(filename)
+    image.reset_points()
+    return image
 
-        # Place vertical grid lines
-        for ix in range(grid_range[0][0] + 1, grid_range[0][1]):
-            if ix == 0:
+@contextlib.contextmanager
+def file_lock(filename, stale_after=60):
+    # A lock shared by concurrent renders. Locks older than `stale_after` seconds were left behind by a crashed render
+    while True:
+        try:
+            lock_file = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(filename) > stale_after:
+                    os.remove(filename)
+                    continue
+            except OSError:
                 continue
-            new_line = Line((ix, grid_range[1][0], 0), (ix, grid_range[1][1], 0), color="#5F5F5F")
-            grid_group.add(new_line)
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(lock_file)
+        os.remove(filename)
+
+def link_or_copy(source, destination):
+    # Hard links share the bytes on disk, but are not available on every file system
+    temporary_filename = f"{destination}.{os.getpid()}.tmp"
+    try:
+        os.link(source, temporary_filename)
+    except OSError:
+        shutil.copyfile(source, temporary_filename)
+    os.replace(temporary_filename, destination)
+
+class PartialMovieCache:
+    # Rendered animations of every scene and quality, stored under the hash manim computes from the animation,
+    # its mobjects and the camera. Scenes keep working in their own partial movie folder, and link files in and
+    # out of this one. It is bounded by a byte budget, evicting the least recently used movies first.
+    GRACE_PERIOD = 3600
+
+    def __init__(self, directory, max_bytes=PARTIAL_MOVIE_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_filename = f"{directory}/index.json"
+        self.lock_filename = f"{directory}/index.lock"
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.index = None
+        self.entries = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.time_saved = 0
+
+    def get_filename(self, hash_animation):
+        return f"{self.directory}/{hash_animation}{config.movie_file_extension}"
+
+    def read_index(self):
+        try:
+            with open(self.index_filename) as index_file:
+                return json.load(index_file)
+        except Exception:
+            return {}
+
+    def write_index(self, index):
+        temporary_filename = f"{self.index_filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "w") as index_file:
+            json.dump(index, index_file, indent=4)
+        os.replace(temporary_filename, self.index_filename)
+
+    def fetch(self, hash_animation, partial_movie_filename, local_hit=False):
+        # Link a cached movie into the scene's partial movie folder, returns whether the animation can be skipped
+        cached_filename = self.get_filename(hash_animation)
+        try:
+            if local_hit:
+                # Rendered by this scene before the shared cache had it
+                if not os.path.exists(cached_filename):
+                    os.makedirs(self.directory, exist_ok=True)
+                    link_or_copy(partial_movie_filename, cached_filename)
+            elif os.path.exists(cached_filename):
+                link_or_copy(cached_filename, partial_movie_filename)
+            else:
+                self.misses += 1
+                return False
+        except OSError:
+            self.misses += 1
+            return local_hit
+
+        if self.index is None:
+            self.index = self.read_index()
+        self.hits += 1
+        self.used.add(hash_animation)
+        self.bytes_saved += os.path.getsize(partial_movie_filename)
+        self.time_saved += self.index.get(hash_animation, {}).get("render_time", 0)
+        return True
+
+    def store(self, hash_animation, partial_movie_filename, render_time, scene=None):
+        if not os.path.exists(partial_movie_filename):
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        link_or_copy(partial_movie_filename, self.get_filename(hash_animation))
+        self.used.add(hash_animation)
+        self.entries[hash_animation] = {
+            "bytes": os.path.getsize(partial_movie_filename),
+            "render_time": render_time,
+            "scene": scene,
+            # Named like manim's quality folders, e.g. 1080p60
+            "quality": f"{config.pixel_height}p{config.frame_rate:g}",
+        }
+
+    def get_size(self):
+        if not os.path.exists(self.directory):
+            return 0
+        return sum(j.stat().st_size for j in os.scandir(self.directory) if j.name.endswith(config.movie_file_extension))
+
+    def commit(self):
+        # Record this render's movies and usage in the index, then evict down to the byte budget
+        if not self.used:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        with file_lock(self.lock_filename):
+            index = self.read_index()
+            now = time.time()
+            for hash_animation in self.used:
+                index.setdefault(hash_animation, {}).update(self.entries.get(hash_animation, {}))
+                index[hash_animation]["last_used"] = now
+            self.evict(index)
+            self.write_index(index)
+
+    def evict(self, index):
+        # Movies used within the grace period may belong to renders still in progress, so they are never evicted
+        movies = []
+        total_bytes = 0
+        for movie in os.scandir(self.directory):
+            if not movie.name.endswith(config.movie_file_extension):
+                continue
+            hash_animation = movie.name[:-len(config.movie_file_extension)]
+            stat = movie.stat()
+            last_used = index.get(hash_animation, {}).get("last_used", stat.st_mtime)
+            movies.append((last_used, hash_animation, movie.path, stat.st_size))
+            total_bytes += stat.st_size
+
+        now = time.time()
+        for last_used, hash_animation, filename, size in sorted(movies):
+            if total_bytes <= self.max_bytes:
+                break
+            if now - last_used < self.GRACE_PERIOD:
+                continue
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            index.pop(hash_animation, None)
+            total_bytes -= size
+
+    def print_report(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return
+        print(
+            f"\033[36;1mPartial movie cache: {self.hits}/{lookups} hits ({self.hits / lookups:.0%}), "
+            f"{self.bytes_saved / 2 ** 20:.1f} MB and {self.time_saved:.1f} seconds saved, "
+            f"{self.get_size() / 2 ** 30:.2f} of {self.max_bytes / 2 ** 30:.2f} GB used\033[0m"
+        )
+
+PARTIAL_MOVIE_CACHE = PartialMovieCache(f"{DIRECTORY}/media/partial_movie_cache")
+
+def find_tex(filename):
+    # Collect the Tex and MathTex of a scene whose arguments can be evaluated without running it
+    calls, skipped = find_constant_calls(filename, ["Tex", "MathTex"])
+    return [(function, args, kwargs) for function, line, args, kwargs in calls if all(isinstance(j, str) for j in args)], skipped
+
+def compile_tex(tex_dir, function, args, kwargs):
+    # Building the mobject compiles its LaTeX into manim's tex cache, or finds it there
+    with tempconfig({"tex_dir": tex_dir}):
+        getattr(manim, function)(*args, **kwargs)
+
+def prepare_tex(filename, workers=4, extra_expressions=()):
+    # Fill manim's tex cache in parallel, so construct never waits for LaTeX. `extra_expressions` are the
+    # (function, args, kwargs) a scene builds from names the scan cannot evaluate, see CGScene.get_tex
+    start_time = time.time()
+    found_expressions, skipped = find_tex(filename)
+
+    # Colors and other styling do not change the LaTeX, and two workers must not compile the same file at once
+    expressions = {}
+    for function, args, kwargs in [*found_expressions, *extra_expressions]:
+        expressions.setdefault((function, tuple(args)), (function, args, kwargs))
+    expressions = list(expressions.values())
+    if expressions:
+        tex_dir = str(config.get_dir("tex_dir"))
+        with get_render_executor(workers) as executor:
+            futures = [executor.submit(compile_tex, tex_dir, *j) for j in expressions]
+            for future in futures:
+                future.result()
+
+    end_time = time.time()
+    print(f"\033[36;1mPrepared {len(expressions)} LaTeX expressions in {end_time - start_time:.4} seconds\033[0m")
+    if skipped:
+        print(f"\033[33mDepend on the scene, so compiled on demand unless get_tex lists them: {', '.join(f'{function} at line {line}' for function, line in skipped)}\033[0m")
+
+class GridLines(VGroup):
+    def __init__(self, grid_range, **kwargs):
+        super().__init__(**kwargs)
+        (x_min, x_max), (y_min, y_max) = grid_range
+
+        # Horizontal and vertical grid lines, skipping the axes
+        ys = np.arange(y_min + 1, y_max, dtype=float)
+        ys = ys[ys != 0]
+        xs = np.arange(x_min + 1, x_max, dtype=float)
+        xs = xs[xs != 0]
+        starts = np.concatenate([
+            np.stack([np.full_like(ys, x_min), ys, np.zeros_like(ys)], axis=1),
+            np.stack([xs, np.full_like(xs, y_min), np.zeros_like(xs)], axis=1),
+        ])
+        ends = np.concatenate([
+            np.stack([np.full_like(ys, x_max), ys, np.zeros_like(ys)], axis=1),
+            np.stack([xs, np.full_like(xs, y_max), np.zeros_like(xs)], axis=1),
+        ])
+
+        # Every line becomes one straight cubic bezier curve, all in a single path
+        self.lines = VMobject().set_stroke("#5F5F5F")
+        self.lines.set_points(line_segments_to_points(starts, ends))
 
         # Place axes
-        x_axis = Line(np.array([grid_range[0][0], 0, 0]), np.array([grid_range[0][1], 0, 0]), color="#9F9F9F")
-        y_axis = Line(np.array([0, grid_range[1][0], 0]), np.array([0, grid_range[1][1], 0]), color="#9F9F9F")
-        grid_group.add(x_axis, y_axis)
+        self.x_axis = Line(np.array([x_min, 0, 0]), np.array([x_max, 0, 0]), color="#9F9F9F")
+        self.y_axis = Line(np.array([0, y_min, 0]), np.array([0, y_max, 0]), color="#9F9F9F")
+        self.add(self.lines, self.x_axis, self.y_axis)
+
+def to_rgba_array(colors, opacity=1.0):
+    # Accepts nested lists of colors or an (H, W, 3 or 4) array with values between 0 and 1
+    if isinstance(colors, np.ndarray) and np.issubdtype(colors.dtype, np.number):
+        colors = colors.astype(float)
+        if colors.shape[2] == 3:
+            colors = np.concatenate([colors, np.full((*colors.shape[:2], 1), opacity)], axis=2)
+        return colors
+    return np.array([[color_to_rgba(j, opacity) for j in row] for row in colors], dtype=float)
+
+class PixelGrid(Group):
+    # A grid of colored cells drawn as one image, with the cell colors kept in an (H, W, 4) array
+    def __init__(self, colors, cell_size=1.0, opacity=1.0, stroke_color="#FFFFFF", stroke_width=0, **kwargs):
+        super().__init__(**kwargs)
+        self.colors = to_rgba_array(colors, opacity)
+        # Opacity of the whole grid on top of the opacity of each cell, which fades change
+        self.opacity = 1.0
+        height, width = self.colors.shape[:2]
+
+        self.image = ImageMobject(self.get_pixel_array())
+        self.image.set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
+        self.image.stretch_to_fit_width(width * cell_size).stretch_to_fit_height(height * cell_size)
+        self.add(self.image)
+
+        # Cell borders, all in a single path
+        self.borders = VMobject().set_stroke(stroke_color, width=stroke_width)
+        if stroke_width > 0:
+            xs = np.arange(width + 1) * cell_size - width * cell_size / 2
+            ys = np.arange(height + 1) * cell_size - height * cell_size / 2
+            starts = [*[(x, ys[0], 0) for x in xs], *[(xs[0], y, 0) for y in ys]]
+            ends = [*[(x, ys[-1], 0) for x in xs], *[(xs[-1], y, 0) for y in ys]]
+            self.borders.set_points(line_segments_to_points(starts, ends))
+            self.add(self.borders)
+
+    def get_pixel_array(self):
+        return np.round(np.clip(self.colors, 0, 1) * [1, 1, 1, self.opacity] * 255).astype(np.uint8)
+
+    def get_grid_shape(self):
+        return self.colors.shape[:2]
+
+    def set_cell_colors(self, colors, opacity=1.0):
+        self.colors = to_rgba_array(colors, opacity)
+        self.image.pixel_array = self.get_pixel_array()
+        return self
+
+    def set_cell_opacity(self, opacity):
+        # A single opacity, or an (H, W) array with one opacity per cell
+        self.colors[:, :, 3] = opacity
+        self.image.pixel_array = self.get_pixel_array()
+        return self
+
+    def set_opacity(self, opacity, family=True):
+        # ImageMobject.set_opacity would overwrite the alpha of every cell, so scale it instead
+        self.opacity = opacity
+        self.image.pixel_array = self.get_pixel_array()
+        self.borders.set_stroke(opacity=opacity)
+        return self
+
+    def fade(self, darkness=0.5, family=True):
+        # FadeIn and FadeOut fade a copy of the grid
+        return self.set_opacity(1 - darkness)
+
+    def interpolate_color(self, mobject1, mobject2, alpha):
+        # Keeps the colors in step with the image while a transform interpolates its pixels
+        self.colors = interpolate(mobject1.colors, mobject2.colors, alpha)
+        self.opacity = interpolate(mobject1.opacity, mobject2.opacity, alpha)
+
+    def get_cell_center(self, ix, iy):
+        height, width = self.get_grid_shape()
+        left, top = self.image.get_corner(UL)[:2]
+        right, bottom = self.image.get_corner(DR)[:2]
+        return np.array([left + (ix + 0.5) * (right - left) / width, top - (iy + 0.5) * (top - bottom) / height, 0])
+
+class TransformPixelColors(Animation):
+    # Interpolates every cell of a PixelGrid towards new colors, optionally one after another like lag_ratio
+    def __init__(self, pixel_grid, colors, order=None, lag_ratio=0, **kwargs):
+        self.target_colors = to_rgba_array(colors)
+        self.order = order
+        self.cell_lag_ratio = lag_ratio
+        super().__init__(pixel_grid, **kwargs)
 
-        return grid_group
+    def begin(self):
+        self.start_colors = self.mobject.colors.copy()
+        if self.target_colors.shape != self.start_colors.shape:
+            raise ValueError(f"Expected colors of shape {self.start_colors.shape}, got {self.target_colors.shape}")
+
+        # Rank of every cell in the order in which they start changing
+        height, width = self.mobject.get_grid_shape()
+        if self.order is None:
+            self.ranks = np.zeros((height, width))
+        else:
+            self.ranks = np.empty(height * width)
+            self.ranks[np.asarray(self.order).ravel()] = np.arange(height * width)
+            self.ranks = self.ranks.reshape(height, width)
+        super().begin()
+
+    def interpolate_mobject(self, alpha):
+        alpha = self.rate_func(alpha)
+        full_length = self.ranks.max() * self.cell_lag_ratio + 1
+        cell_alpha = np.clip(alpha * full_length - self.ranks * self.cell_lag_ratio, 0, 1)[:, :, None]
+        self.mobject.colors = self.start_colors + (self.target_colors - self.start_colors) * cell_alpha
+        self.mobject.image.pixel_array = self.mobject.get_pixel_array()
+
+class ApplyHomogeneousMatrix(Transform):
+    # Like ApplyPointwiseFunction with a 4x4 matrix and perspective divide, but one matrix product for the whole family
+    def __init__(self, matrix, mobject, **kwargs):
+        self.matrix = np.asarray(matrix, dtype=float)
+        super().__init__(mobject, **kwargs)
+
+    def create_target(self):
+        target = self.mobject.copy()
+        apply_to_family(target, lambda points: apply_homogeneous(points, self.matrix), about_point=ORIGIN)
+        return target
+
+def get_points_snapshot(mobjects):
+    # A copy of the points of every mobject's family, one array per mobject
+    snapshot = []
+    for mobject in mobjects:
+        members = mobject.family_members_with_points()
+        snapshot.append(np.concatenate([j.points for j in members]) if members else np.zeros((0, 3)))
+    return snapshot
+
+def points_changed(snapshot, previous_snapshot):
+    return previous_snapshot is None or any(a.shape != b.shape or not np.array_equal(a, b) for a, b in zip(snapshot, previous_snapshot))
+
+def add_dependent_updater(mobject, update_function, inputs, track_self=False, call_updater=False):
+    # Like add_updater, but update_function only runs when the points of one of `inputs` changed since its last run,
+    # so waits and unrelated animations skip its work. That includes the update resume_updating does after an animation:
+    # use track_self when other animations may move the mobject itself, so the updater puts it back. Only points are
+    # compared, so colors and pixel arrays are not tracked
+    inputs = list(inputs)
+    state = {"inputs": None, "self": None}
+
+    @functools.wraps(update_function)
+    def dependent_update_function(obj, *args, **kwargs):
+        snapshot = get_points_snapshot(inputs)
+        changed = points_changed(snapshot, state["inputs"])
+        if track_self and not changed:
+            changed = points_changed(get_points_snapshot([obj]), state["self"])
+        if not changed:
+            return None
+
+        result = update_function(obj, *args, **kwargs)
+        state["inputs"] = snapshot
+        if track_self:
+            state["self"] = get_points_snapshot([obj])
+        return result
+
+    return mobject.add_updater(dependent_update_function, call_updater=call_updater)
+
+class CGScene(ThreeDScene):
+    # Number of processes that build the scene's captions before rendering, 0 builds them on demand
+    caption_workers = 0
+    # Number of processes that compile the scene's Tex and MathTex before rendering, 0 compiles them on demand
+    tex_workers = 0
+    # Record the call count and time of every updater per animation, written to videos/<scene>_updaters.json
+    profile_updaters = False
+    # Folder to save the last frame of every animation to, see render_keyframes
+    keyframe_directory = None
+    keyframe_range = (0, 1000)
+
+    def setup(self):
+        super().setup()
+        if self.tex_workers > 0 and not config.dry_run:
+            prepare_tex(inspect.getsourcefile(type(self)), self.tex_workers, self.get_tex())
+        if self.caption_workers > 0 and not config.dry_run:
+            prepare_captions(inspect.getsourcefile(type(self)), self.caption_workers)
+
+        self.caption_text = ""
+        self.keyframes = []
+        self.animation_timings = []
+        self.timing_depth = 0
+        self.scene_time = 0
+        self.source_filename = inspect.getsourcefile(type(self))
+        self.updater_stats = {}
+        if self.profile_updaters:
+            self.start_updater_profiler()
+        self.frames_written = 0
+
+        # Count frames as they are written to the movie file. Static waits write one frame num_frames times in a single call
+        file_writer = self.renderer.file_writer
+        write_frame = file_writer.write_frame
+        def counting_write_frame(*args, **kwargs):
+            self.frames_written += kwargs.get("num_frames", args[1] if len(args) > 1 else 1)
+            return write_frame(*args, **kwargs)
+        file_writer.write_frame = counting_write_frame
+        self.use_partial_movie_cache(file_writer)
+
+    def use_partial_movie_cache(self, file_writer):
+        # manim only looks for cached animations in the scene's own partial movie folder, so look in the shared
+        # cache as well, and add every newly rendered animation to it
+        if config.disable_caching or config.dry_run or not hasattr(file_writer, "partial_movie_directory"):
+            return
+        PARTIAL_MOVIE_CACHE.reset_stats()
+        scene_name = get_scene_name(str(config.input_file)) if config.input_file else type(self).__name__
+        rendering = {}
+
+        is_already_cached = file_writer.is_already_cached
+        def shared_is_already_cached(hash_invocation):
+            partial_movie_filename = str(file_writer.partial_movie_directory / f"{hash_invocation}{config.movie_file_extension}")
+            return PARTIAL_MOVIE_CACHE.fetch(hash_invocation, partial_movie_filename, is_already_cached(hash_invocation))
+        file_writer.is_already_cached = shared_is_already_cached
+
+        add_partial_movie_file = file_writer.add_partial_movie_file
+        def timed_add_partial_movie_file(hash_animation):
+            rendering["hash"] = hash_animation
+            rendering["start_time"] = time.perf_counter()
+            return add_partial_movie_file(hash_animation)
+        file_writer.add_partial_movie_file = timed_add_partial_movie_file
+
+        end_animation = file_writer.end_animation
+        def storing_end_animation(allow_write=False):
+            result = end_animation(allow_write)
+            hash_animation = rendering.pop("hash", None)
+            if allow_write and hash_animation and not hash_animation.startswith("uncached_"):
+                partial_movie_filename = str(file_writer.partial_movie_directory / f"{hash_animation}{config.movie_file_extension}")
+                PARTIAL_MOVIE_CACHE.store(hash_animation, partial_movie_filename, time.perf_counter() - rendering["start_time"], scene_name)
+            return result
+        file_writer.end_animation = storing_end_animation
+
+    def record_timing(self, kind, function, *args, **kwargs):
+        # Only the outermost call is recorded, since move_camera and wait call play themselves
+        if self.timing_depth > 0:
+            return function(*args, **kwargs)
+
+        animation_number = self.renderer.num_plays
+        frames_before = self.frames_written
+        line = self.get_source_line()
+        self.timing_depth += 1
+        run_time = 0
+        static = False
+        start_time = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+            run_time = self.duration
+            static = self.is_current_animation_frozen_frame()
+            return result
+        finally:
+            end_time = time.perf_counter()
+            self.timing_depth -= 1
+            self.animation_timings.append({
+                "animation_number": animation_number,
+                "kind": kind,
+                "start_time": self.scene_time,
+                "run_time": run_time,
+                "static": static,
+                "wall_time": end_time - start_time,
+                "frames": self.frames_written - frames_before,
+                "mobjects": len(self.get_mobject_family_members()),
+                "caption": self.caption_text,
+                "line": line,
+            })
+            self.scene_time += run_time
+            if self.keyframe_directory is not None:
+                self.save_keyframe(animation_number, kind)
+
+    def start_updater_profiler(self):
+        # Wrap every updater added from now on, remembering which line of the scene added it
+        scene = self
+        add_updater = Mobject.add_updater
+        remove_updater = Mobject.remove_updater
+
+        def profiled_add_updater(mobject, update_function, *args, **kwargs):
+            # Report the scene's own function, not the wrappers of add_dependent_updater
+            original_function = inspect.unwrap(update_function)
+            code = getattr(original_function, "__code__", None)
+            key = (getattr(original_function, "__name__", type(original_function).__name__), code.co_firstlineno if code else None, type(mobject).__name__, scene.get_source_line())
+
+            # functools.wraps keeps the signature visible, which manim checks for a dt parameter
+            @functools.wraps(update_function)
+            def profiled_update_function(*update_args, **update_kwargs):
+                start_time = time.perf_counter()
+                try:
+                    return update_function(*update_args, **update_kwargs)
+                finally:
+                    stats = scene.updater_stats.setdefault(scene.renderer.num_plays, {}).setdefault(key, [0, 0])
+                    stats[0] += 1
+                    stats[1] += time.perf_counter() - start_time
+            return add_updater(mobject, profiled_update_function, *args, **kwargs)
+
+        def profiled_remove_updater(mobject, update_function):
+            # Scenes remove updaters by the function they added, not by its wrapper
+            for updater in list(mobject.updaters):
+                if updater is not update_function and inspect.unwrap(updater) is inspect.unwrap(update_function):
+                    remove_updater(mobject, updater)
+            return remove_updater(mobject, update_function)
+
+        Mobject.add_updater = profiled_add_updater
+        Mobject.remove_updater = profiled_remove_updater
+        self.updater_methods = (add_updater, remove_updater)
+
+    def stop_updater_profiler(self):
+        if not hasattr(self, "updater_methods"):
+            return
+        Mobject.add_updater, Mobject.remove_updater = self.updater_methods
+        del self.updater_methods
+
+    def write_updater_profile(self):
+        if config.dry_run or not config.input_file or not self.updater_stats:
+            return
+
+        rows = []
+        for animation_number, stats in sorted(self.updater_stats.items()):
+            for (name, defined_at, mobject, added_at), (calls, total_time) in stats.items():
+                rows.append({
+                    "animation_number": animation_number,
+                    "updater": name,
+                    "defined_at": defined_at,
+                    "mobject": mobject,
+                    "added_at": added_at,
+                    "calls": calls,
+                    "time": total_time,
+                })
+
+        if not os.path.exists(f"{DIRECTORY}/videos"):
+            os.mkdir(f"{DIRECTORY}/videos")
+        name = get_scene_name(str(config.input_file))
+        with open(f"{DIRECTORY}/videos/{name}_updaters.json", "w") as json_file:
+            json.dump(rows, json_file, indent=4)
+
+        def describe(row):
+            return f"{row['updater']} (line {row['defined_at']}) on {row['mobject']}, added at line {row['added_at']}"
+
+        # Slowest updaters over the whole scene
+        totals = {}
+        for row in rows:
+            key = describe(row)
+            calls, total_time = totals.get(key, (0, 0))
+            totals[key] = (calls + row["calls"], total_time + row["time"])
+        print("\033[1;36mSlowest updaters\033[0m")
+        for key, (calls, total_time) in sorted(totals.items(), key=lambda j: -j[1][1])[:10]:
+            print(f"  {total_time:>8.3f} s {calls:>8} calls  {key}")
+
+        # Top offenders of the animations that spend the most time in updaters
+        animation_times = {}
+        for row in rows:
+            animation_times[row["animation_number"]] = animation_times.get(row["animation_number"], 0) + row["time"]
+        print("\033[1;36mAnimations with the slowest updaters\033[0m")
+        for animation_number, animation_time in sorted(animation_times.items(), key=lambda j: -j[1])[:5]:
+            print(f"  #{animation_number:<4} {animation_time:>8.3f} s")
+            offenders = sorted([j for j in rows if j["animation_number"] == animation_number], key=lambda j: -j["time"])[:3]
+            for row in offenders:
+                print(f"    {row['time']:>8.3f} s {row['calls']:>8} calls  {describe(row)}")
+
+    def get_source_line(self):
+        # Line of the scene file that is currently running, found by walking up the stack
+        frame = sys._getframe(1)
+        while frame is not None:
+            if frame.f_code.co_filename == self.source_filename:
+                return frame.f_lineno
+            frame = frame.f_back
+        return None
+
+    def save_keyframe(self, animation_number, kind):
+        start_at, end_at = self.keyframe_range
+        if not start_at <= animation_number <= end_at:
+            return
+
+        self.renderer.update_frame(self)
+        filename = f"{self.keyframe_directory}/{animation_number:04}.png"
+        self.renderer.camera.get_image().save(filename)
+        self.keyframes.append({
+            "animation_number": animation_number,
+            "kind": kind,
+            "caption": self.caption_text,
+            "filename": filename,
+        })
+
+    def play(self, *args, **kwargs):
+        return self.record_timing("play", super().play, *args, **kwargs)
+
+    def wait(self, *args, **kwargs):
+        return self.record_timing("wait", super().wait, *args, **kwargs)
+
+    def move_camera(self, *args, **kwargs):
+        return self.record_timing("move_camera", super().move_camera, *args, **kwargs)
+
+    def write_timings(self):
+        if config.dry_run or not config.input_file or not self.animation_timings:
+            return
+
+        if not os.path.exists(f"{DIRECTORY}/videos"):
+            os.mkdir(f"{DIRECTORY}/videos")
+        name = get_scene_name(str(config.input_file))
+        timings_filename = f"{DIRECTORY}/videos/{name}_timings"
+
+        with open(f"{timings_filename}.json", "w") as json_file:
+            json.dump(self.animation_timings, json_file, indent=4)
+        with open(f"{timings_filename}.csv", "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(self.animation_timings[0].keys()))
+            writer.writeheader()
+            writer.writerows(self.animation_timings)
+
+        # Print the slowest animations
+        print("\033[1;36mSlowest animations\033[0m")
+        for timing in sorted(self.animation_timings, key=lambda j: -j["wall_time"])[:5]:
+            print(f"  #{timing['animation_number']:<4} {timing['kind']:<12} {timing['wall_time']:>8.3f} s {timing['frames']:>6} frames {timing['mobjects']:>6} mobjects  {timing['caption'][:40]}")
+
+    def render(self, preview=False):
+        # The profiler patches Mobject itself, so it must not outlive the scene when construct fails before tear_down
+        try:
+            return super().render(preview)
+        finally:
+            self.stop_updater_profiler()
+
+    def tear_down(self):
+        super().tear_down()
+        self.write_timings()
+        self.stop_updater_profiler()
+        self.write_updater_profile()
+        if not config.dry_run:
+            PARTIAL_MOVIE_CACHE.commit()
+            PARTIAL_MOVIE_CACHE.print_report()
+
+    def get_title(self):
+        return "Untitled"
+
+    def get_tex(self):
+        # Tex and MathTex the scene builds from loop variables or other local names, as (function, args, kwargs),
+        # so tex_workers can compile them ahead of time as well
+        return []
+
+    def all_objects(self):
+        return Group(*filter(lambda x: issubclass(type(x), Mobject), self.mobjects)).remove(self.title_text)
+
+    def generate_grid(self, grid_range):
+        return GridLines(grid_range)
 
     def generate_crosshairs(self):
         # Place arrows
@@ -88,18 +1463,7 @@ class CGScene(ThreeDScene):
         scale = kwargs.get("scale", 0.7)
         pos = kwargs.get("pos", self.default_caption_pos)
 
-        # Group text in new lines
-        texts = text.split()
-        final_text = ""
-        line_length = 0
-        for t in texts:
-            if line_length + 1 + len(t) <= 60:
-                final_text += " " + t
-                line_length += 1 + len(t)
-            else:
-                final_text += "\n" + t
-                line_length = len(t)
-        final_text = final_text[1:]
+        final_text = wrap_caption(text)
 
         # Print current text
         print("\033[1;34m", end="")
@@ -108,13 +1472,8 @@ class CGScene(ThreeDScene):
             print(["  ", "\n- "][i == 0] + final_text_lines[i])
         print("\033[0m", end="")
 
-        # Create new caption
-        new_caption = Text(final_text, t2s=t2s).set_color("#FFFFFF")
-        new_caption.scale(scale).shift(pos)
-        new_caption._set_color_by_t2c(t2c)
-        new_caption.set_z_index(1000)
-        new_caption.add_background_rectangle("#000000", 0.5, buff=0.2, corner_radius=0.2)
-        new_caption.background_rectangle.set_z_index(999)
+        # Create new caption, or copy it from the cache
+        new_caption = CAPTION_CACHE.get(final_text, t2c, t2s, scale).shift(pos)
         self.add_fixed_in_frame_mobjects(new_caption)
         actions = [FadeIn(new_caption, shift=UP)]
 
@@ -123,11 +1482,45 @@ class CGScene(ThreeDScene):
             actions.extend([FadeOut(self.caption)])
 
         self.caption = new_caption
+        self.caption_text = " ".join(text.split())
         return actions
 
     def get_asset(self, filename):
+        if ASSET_CACHE.is_procedural(filename):
+            return ASSET_CACHE.get(filename)
         return f"{DIRECTORY}/assets/{filename}"
 
+    def get_image(self, filename, width=None, scale=1, max_scale=1, resampling="bicubic"):
+        # An ImageMobject of the asset that is `width` units wide, or `scale` times its usual size, and may later be
+        # scaled up by `max_scale`. It is loaded from the smallest mip level that is still sharp at that size
+        # in the current output resolution, which makes draft renders use small proxies.
+        # `resampling` is how the image is drawn, manim's bicubic by default. The mip levels are averaged, or decimated for "nearest"
+        path = self.get_asset(filename)
+        mip_resampling = "nearest" if resampling == "nearest" else "bilinear"
+        with Image.open(path) as image:
+            full_size = image.size
+
+        scale_to_resolution = QUALITIES[DEFAULT_QUALITY]["pixel_height"]
+        full_width = full_size[0] / scale_to_resolution * config.frame_height
+        full_height = full_size[1] / scale_to_resolution * config.frame_height
+        if width is not None:
+            scale = width / full_width
+
+        pixels_per_unit = config.pixel_height / config.frame_height
+        level_filename = MIPMAP_CACHE.get(
+            path,
+            full_width * scale * max_scale * pixels_per_unit,
+            full_height * scale * max_scale * pixels_per_unit,
+            mip_resampling
+        )
+
+        # Smaller levels would come out smaller, so stretch them to the size of the full image
+        image = shared_image_mobject(level_filename)
+        image.set_resampling_algorithm(RESAMPLING_ALGORITHMS[resampling])
+        image.stretch_to_fit_width(full_width * scale)
+        image.stretch_to_fit_height(full_height * scale)
+        return image
+
     def appear(self, obj):
         if type(obj) == Arrow:
             start = obj.get_start()
@@ -52,6 +52,11 @@ class MainScene(CGScene):
             (7, 12),
         ]
 
+        edges = self.generate_edges(points)
+        edges.shift((-8, -8, 0)).scale(0.2)
+        return edges
+
+    def generate_edges(self, points):
         edges = Group()
         for i in range(len(points)):
             a = np.array([*points[i], 0])
@@ -59,8 +64,6 @@ class MainScene(CGScene):
 
             edge = Line(a, b).set_color(LIGHT_YELLOW)
             edges.add(edge)
-
-        edges.shift((-8, -8, 0)).scale(0.2)
         return edges
 
     def animate(self):
@@ -0,0 +1,69 @@
+import numpy as np
+
+# Every function takes an (N, 3) array of points and transforms all of them in one NumPy pass,
+# so they can be passed straight to Mobject.apply_points_function_about_point.
+
+def cubify(points, power):
+    # Divide each point by a power of its largest absolute coordinate, pushing a sphere towards a cube
+    factor = np.max(np.abs(points), axis=1) ** power
+    mask = factor > 1e-6
+    points[mask] /= factor[mask, None]
+    return points
+
+def apply_homogeneous(points, matrix):
+    # Scene coordinates have Z pointing up, while the matrices expect Y up and the camera looking down -Z
+    vectors = np.column_stack([points[:, 0], points[:, 2], -points[:, 1], np.ones(len(points))])
+    result = vectors @ np.asarray(matrix).T
+    return np.column_stack([result[:, 0], -result[:, 2], result[:, 1]]) / result[:, 3:4]
+
+def stretch(points, factors):
+    # Scale every axis by its own factor
+    return points * np.asarray(factors, dtype=float)
+
+def squish(points, dim, factor=0.01):
+    # Flatten the points along a single axis
+    points[:, dim] *= factor
+    return points
+
+def line_segments_to_points(starts, ends):
+    # Turn every (start, end) pair into one straight cubic bezier curve, ready for VMobject.set_points
+    t = np.linspace(0, 1, 4).reshape(1, 4, 1)
+    return (np.asarray(starts, dtype=float)[:, None, :] * (1 - t) + np.asarray(ends, dtype=float)[:, None, :] * t).reshape(-1, 3)
+
+def apply_to_family(mobject, function, about_point=None):
+    # Transform the points of every family member at once, instead of one array per submobject
+    if about_point is None:
+        about_point = mobject.get_center()
+    members = mobject.family_members_with_points()
+    if not members:
+        return mobject
+
+    sizes = [len(j.points) for j in members]
+    points = function(np.concatenate([j.points for j in members]) - about_point) + about_point
+    for member, member_points in zip(members, np.split(points, np.cumsum(sizes)[:-1])):
+        member.points = member_points
+    return mobject
+
+class PointBuffer:
+    # Keeps the points of several mobjects in one contiguous array, next to a copy of their rest pose
+    def __init__(self, mobjects):
+        self.mobjects = list(mobjects)
+        self.rest_points = np.concatenate([j.points for j in self.mobjects])
+        self.points = self.rest_points.copy()
+
+        bounds = np.cumsum([0] + [len(j.points) for j in self.mobjects])
+        self.views = [self.points[bounds[i]:bounds[i + 1]] for i in range(len(self.mobjects))]
+        self.attach()
+
+    def attach(self):
+        # Animations may have replaced a mobject's points, so point it back at its slice of the buffer
+        for mobject, view in zip(self.mobjects, self.views):
+            if mobject.points is not view:
+                mobject.points = view
+
+    def apply_affine(self, matrix, shift_before=0, shift_after=0):
+        # points = (rest_points + shift_before) @ matrix.T + shift_after, in a single product
+        np.matmul(self.rest_points + shift_before, np.asarray(matrix).T, out=self.points)
+        self.points += shift_after
+        self.attach()
+        return self.points
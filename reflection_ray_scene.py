@@ -3,20 +3,25 @@ from manim import *
 from math import pi, sqrt
 
 class MainScene(CGScene):
+    tex_workers = 4
+
     def get_title(self):
         return "Reflection Ray Formula"
 
-    def animate(self):
-        # Show mirror, N and L
+    def generate_mirror(self, iterations=15):
         mirror_group = Group()
         mirror_line = Line(LEFT * 5, RIGHT * 5, color="#FFFFFF")
         mirror_text = Text("Mirror", color="#FFFFFF").move_to(0.3 * UP + 4 * LEFT).scale(0.65)
         mirror_group.add(mirror_line, mirror_text)
-        iterations = 15
         for i in range(iterations):
             x = (i - iterations // 2) * 0.65
             diagonal_line = Line(RIGHT * x + LEFT * 0.1 + DOWN * 0.2, RIGHT * x + RIGHT * 0.1)
             mirror_group.add(diagonal_line)
+        return mirror_group
+
+    def animate(self):
+        # Show mirror, N and L
+        mirror_group = self.generate_mirror()
 
         normal_group = Group()
         normal_arrow = Arrow().put_start_and_end_on((0, 0, 0), UP * 4)
@@ -29,7 +34,7 @@ class MainScene(CGScene):
         light_text = Tex("$\hat{L}$", color="#FFFF00").move_to(LEFT * sqrt(12) + UP * 1.6)
         light_group.add(light_arrow, light_text)
         light_group.shift((-sqrt(3) * 5, 5, 0))
-        sun_image = ImageMobject(self.get_asset("sun.png")).scale(0.2).move_to(LEFT * sqrt(12) * 1.25 + UP * 2.5)
+        sun_image = self.get_image("sun.png", scale=0.2).move_to(LEFT * sqrt(12) * 1.25 + UP * 2.5)
         self.play(
             FadeIn(mirror_group),
             FadeIn(normal_group),
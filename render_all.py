@@ -1,7 +1,10 @@
-from imports import render_video, DIRECTORY
+from imports import render_video, render_videos, DIRECTORY
 
 HIGH_QUALITY = True
 
+# Number of scenes rendered at the same time, 1 renders them one by one
+WORKERS = 4
+
 LIST = [
     "alpha_blending_scene.py",
     "bilinear_interpolation_scene.py",
@@ -10,5 +13,8 @@ LIST = [
     "reflection_ray_scene.py",
 ]
 
-for filename in LIST:
-    render_video(f"{DIRECTORY}\\{filename}", HIGH_QUALITY, 0, 1000)
\ No newline at end of file
+if WORKERS > 1:
+    render_videos([f"{DIRECTORY}\\{filename}" for filename in LIST], HIGH_QUALITY, WORKERS)
+else:
+    for filename in LIST:
+        render_video(f"{DIRECTORY}\\{filename}", HIGH_QUALITY, 0, 1000)
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Samples (height, width, channels) images at batches of (N, 2) continuous texel coordinates, where (0, 0) is
+# the center of the top left texel and (width - 1, height - 1) the center of the bottom right one.
+# The edge modes are the ones bilinear_interpolation_scene.py explains:
+#   "clamp"  - samples past the edge reuse the outermost texels
+#   "repeat" - the image tiles in both directions, so the edges blend with the opposite side
+#   "inner"  - only the area between the texel centers is sampled, everything outside comes out as zeros
+
+WRAP_MODES = ["clamp", "repeat", "inner"]
+FILTERS = ["nearest", "bilinear"]
+
+def uv_to_texels(uv, size):
+    # Texture coordinates in [0, 1] with V pointing up, as the texture coordinates scene uses them
+    width, height = size
+    uv = np.asarray(uv, dtype=float)
+    return np.column_stack([uv[:, 0] * width - 0.5, (1 - uv[:, 1]) * height - 0.5])
+
+def wrap_indices(indices, length, wrap):
+    if wrap == "repeat":
+        return np.mod(indices, length)
+    return np.clip(indices, 0, length - 1)
+
+def get_inner_mask(coordinates, size):
+    width, height = size
+    return (coordinates[:, 0] >= 0) & (coordinates[:, 0] <= width - 1) & (coordinates[:, 1] >= 0) & (coordinates[:, 1] <= height - 1)
+
+def bilinear_weights(fraction_x, fraction_y):
+    # Weights of the top left, top right, bottom left and bottom right texel, as an (N, 4) array
+    fraction_x = np.asarray(fraction_x, dtype=float)
+    fraction_y = np.asarray(fraction_y, dtype=float)
+    return np.column_stack([
+        (1 - fraction_x) * (1 - fraction_y),
+        fraction_x * (1 - fraction_y),
+        (1 - fraction_x) * fraction_y,
+        fraction_x * fraction_y,
+    ])
+
+def sample_nearest(image, coordinates, wrap="clamp"):
+    image = np.asarray(image)
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    height, width = image.shape[:2]
+    texels = image.reshape(height * width, -1)
+
+    ix = wrap_indices(np.floor(coordinates[:, 0] + 0.5).astype(int), width, wrap)
+    iy = wrap_indices(np.floor(coordinates[:, 1] + 0.5).astype(int), height, wrap)
+    result = texels[iy * width + ix].astype(float)
+    if wrap == "inner":
+        result[~get_inner_mask(coordinates, (width, height))] = 0
+    return result
+
+def sample_bilinear(image, coordinates, wrap="clamp"):
+    image = np.asarray(image)
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    height, width = image.shape[:2]
+    texels = image.reshape(height * width, -1)
+
+    x0 = np.floor(coordinates[:, 0]).astype(int)
+    y0 = np.floor(coordinates[:, 1]).astype(int)
+    weights = bilinear_weights(coordinates[:, 0] - x0, coordinates[:, 1] - y0)
+    x0, x1 = wrap_indices(x0, width, wrap), wrap_indices(x0 + 1, width, wrap)
+    y0, y1 = wrap_indices(y0, height, wrap), wrap_indices(y0 + 1, height, wrap)
+
+    # Gather the four neighbours of every sample at once, then take their weighted sum
+    indices = np.column_stack([y0 * width + x0, y0 * width + x1, y1 * width + x0, y1 * width + x1])
+    result = np.einsum("nk,nkc->nc", weights, texels[indices].astype(float))
+    if wrap == "inner":
+        result[~get_inner_mask(coordinates, (width, height))] = 0
+    return result
+
+def sample(image, coordinates, filter="bilinear", wrap="clamp"):
+    if filter not in FILTERS:
+        raise ValueError(f"Unknown filter '{filter}', expected one of {FILTERS}")
+    if wrap not in WRAP_MODES:
+        raise ValueError(f"Unknown wrap mode '{wrap}', expected one of {WRAP_MODES}")
+    if filter == "nearest":
+        return sample_nearest(image, coordinates, wrap)
+    return sample_bilinear(image, coordinates, wrap)
+
+def resample(image, size, filter="bilinear", wrap="clamp"):
+    # Resample a whole image to size = (width, height) pixels. With "inner" the result only covers the area
+    # between the outer texel centers, so it is one texel smaller in both directions than the other modes
+    height, width = np.asarray(image).shape[:2]
+    output_width, output_height = size
+    if wrap == "inner":
+        xs = (np.arange(output_width) + 0.5) / output_width * (width - 1)
+        ys = (np.arange(output_height) + 0.5) / output_height * (height - 1)
+    else:
+        xs = (np.arange(output_width) + 0.5) / output_width * width - 0.5
+        ys = (np.arange(output_height) + 0.5) / output_height * height - 0.5
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    result = sample(image, np.column_stack([grid_x.ravel(), grid_y.ravel()]), filter, wrap)
+    return result.reshape(output_height, output_width, -1)
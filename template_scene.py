@@ -16,6 +16,10 @@ class MainScene(CGScene):
 HIGH_QUALITY = False
 START_AT = 0
 END_AT = 1000
+# Save the last frame of every animation and a contact sheet, instead of rendering a video
+KEYFRAMES = False
+# Write the animations, their timing and captions to a JSON file, without rendering anything
+TIMELINE = False
 
 if __name__ == "__main__":
-    render_video(os.path.realpath(__file__), HIGH_QUALITY, START_AT, END_AT)
\ No newline at end of file
+    render_video(os.path.realpath(__file__), HIGH_QUALITY, START_AT, END_AT, keyframes=KEYFRAMES, timeline=TIMELINE)
\ No newline at end of file
@@ -1,11 +1,36 @@
 from imports import *
 from manim import *
 import numpy as np
+from point_transforms import PointBuffer
+from texture_mapping import map_texture
+
+# Draw the destination texture as one raster image instead of one polygon per texel
+RASTER_TEXTURE = False
+# Warp an image from the assets folder instead of IMAGE_PATTERN, e.g. "mona_lisa_small.png" (implies RASTER_TEXTURE)
+TEXTURE_ASSET = None
+
+COLOR_MAP = {
+    ".": "#9F9FFF",
+    "R": "#FF0000",
+    "Y": "#FFBF00",
+    "G": "#9F7F00",
+}
 
 class MainScene(CGScene):
     def get_title(self):
         return "Texture Coordinates"
 
+    def generate_texture(self, image_pattern, color_map):
+        texture = Group()
+        for iy in range(len(image_pattern)):
+            for ix in range(len(image_pattern[0])):
+                color = color_map[image_pattern[iy][ix]]
+                square = Polygon(ORIGIN, UP, UP + RIGHT, RIGHT).set_stroke(color, opacity=1, width=0.6).set_fill(color, opacity=1)
+                square.move_to((ix, -iy, 0))
+                square.set_z_index(15)
+                texture.add(square)
+        return texture
+
     def animate(self):
         IMAGE_PATTERN = [
             ".............YYY",
@@ -25,12 +50,6 @@ class MainScene(CGScene):
             ".GGGRRRRRRR.....",
             ".G..RRRR........",
         ]
-        COLOR_MAP = {
-            ".": "#9F9FFF",
-            "R": "#FF0000",
-            "Y": "#FFBF00",
-            "G": "#9F7F00",
-        }
         RED = "#FF1F1F"
         GREEN = "#00DF00"
         BLUE = "#007FFF"
@@ -43,24 +62,35 @@ class MainScene(CGScene):
                 return v
             return v / norm
 
-        source_texture = Group()
-        for iy in range(len(IMAGE_PATTERN)):
-            for ix in range(len(IMAGE_PATTERN[0])):
-                color = COLOR_MAP[IMAGE_PATTERN[iy][ix]]
-                square = Polygon(ORIGIN, UP, UP + RIGHT, RIGHT).set_stroke(color, opacity=1, width=0.6).set_fill(color, opacity=1)
-                square.move_to((ix, -iy, 0))
-                square.set_z_index(15)
-                source_texture.add(square)
-
-        source_texture.scale(0.25).move_to((-OFFSET, 0, 0))
+        if TEXTURE_ASSET:
+            # The texture and the rasterizer both read the mapped pixels, without copying them
+            source_image = SHARED_IMAGES.load(self.get_asset(TEXTURE_ASSET))
+            source_texture = shared_image_mobject(self.get_asset(TEXTURE_ASSET)).set_resampling_algorithm(RESAMPLING_ALGORITHMS["nearest"])
+            source_texture.scale_to_fit_height(4).move_to((-OFFSET, 0, 0)).set_z_index(15)
+        else:
+            source_image = np.array([[color_to_int_rgba(COLOR_MAP[j]) for j in row] for row in IMAGE_PATTERN], dtype=np.uint8)
+            source_texture = self.generate_texture(IMAGE_PATTERN, COLOR_MAP)
+            source_texture.scale(0.25).move_to((-OFFSET, 0, 0))
         self.play(
             FadeIn(source_texture)
         )
 
-        destination_texture = Group(*[j.copy() for j in source_texture])
-        destination_texture.shift(2 * OFFSET * RIGHT).set_z_index(5)
-        for square in destination_texture:
-            square.save_state()
+        if RASTER_TEXTURE or TEXTURE_ASSET:
+            # Rasterize the right half of the screen at output resolution
+            source_bounds = (*source_texture.get_corner(DL)[:2], *source_texture.get_corner(UR)[:2])
+            canvas_bounds = (0, -config.frame_height / 2, config.frame_width / 2, config.frame_height / 2)
+            canvas_size = (config.pixel_width // 2, config.pixel_height)
+            def rasterize_texture(tc_triangle, pc_triangle):
+                return map_texture(source_image, tc_triangle, pc_triangle, source_bounds, canvas_bounds, canvas_size, "nearest")
+
+            # Rasterized from the control points once they exist, see below
+            destination_texture = ImageMobject(np.zeros((canvas_size[1], canvas_size[0], 4), dtype=np.uint8))
+            destination_texture.stretch_to_fit_width(config.frame_width / 2).stretch_to_fit_height(config.frame_height)
+            destination_texture.move_to((config.frame_width / 4, 0, 0)).set_z_index(5)
+        else:
+            destination_texture = Group(*[j.copy() for j in source_texture])
+            destination_texture.shift(2 * OFFSET * RIGHT).set_z_index(5)
+            destination_buffer = PointBuffer(destination_texture)
 
         # Create triangles
         triangles = {}
@@ -84,7 +114,7 @@ class MainScene(CGScene):
                 line.ends = [points[i - 2], points[i - 1]]
                 line_updater = lambda m: m.put_start_and_end_on(m.ends[0].get_center(), m.ends[1].get_center())
                 line_updater(line)
-                line.add_updater(line_updater)
+                add_dependent_updater(line, line_updater, line.ends, track_self=True)
                 lines.append(line)
 
             def align_label(obj):
@@ -105,7 +135,7 @@ class MainScene(CGScene):
                 label.point = points[i]
                 label_updater = lambda m: align_label(m)
                 label_updater(label)
-                label.add_updater(label_updater)
+                add_dependent_updater(label, label_updater, [label.point, *label.point.neighbors], track_self=True)
                 labels.append(label)
 
             triangles[ty] = (points, lines, labels)
@@ -165,25 +195,18 @@ class MainScene(CGScene):
             cover.save_state()
 
             keep_cover_in_place(cover)
-            cover.add_updater(keep_cover_in_place)
+            add_dependent_updater(cover, keep_cover_in_place, [cover.point, *cover.point.neighbors], track_self=True)
             covers.append(cover)
 
         self.add(*covers)
+        if RASTER_TEXTURE or TEXTURE_ASSET:
+            destination_texture.pixel_array = rasterize_texture([j.get_center() for j in tc_points], [j.get_center() for j in pc_points])
         self.play(
             FadeIn(destination_texture),
             run_time=0.6
         )
         self.wait(2)
 
-        def warp_points(points, matrix):
-            for i in range(points.shape[0]):
-                points[i] = matrix @ points[i]
-            return points
-        def warp_square(obj, matrix):
-            obj.restore()
-            obj.shift(2 * OFFSET * LEFT - tc_points[0].get_center())
-            obj.apply_points_function_about_point(lambda points: warp_points(points, matrix), about_point=ORIGIN)
-            obj.shift(pc_points[0].get_center())
         def warp_texture(obj):
             to_correct = 0
             tc_matrix = None
@@ -200,10 +223,17 @@ class MainScene(CGScene):
             pc_matrix = np.array([b - a, c - a, [0, 0, 1]]).T
             matrix = pc_matrix @ np.linalg.inv(tc_matrix)
 
-            for square in obj:
-                warp_square(square, matrix)
+            # Warp every square from its rest pose at once
+            destination_buffer.apply_affine(matrix, 2 * OFFSET * LEFT - tc_points[0].get_center(), pc_points[0].get_center())
+
+        def raster_warp_texture(obj):
+            obj.pixel_array = rasterize_texture([j.get_center() for j in tc_points], [j.get_center() for j in pc_points])
 
-        destination_texture.add_updater(warp_texture)
+        # Only warp again when a control point moved. Nothing else moves the destination texture, so it is not tracked itself
+        if RASTER_TEXTURE or TEXTURE_ASSET:
+            add_dependent_updater(destination_texture, raster_warp_texture, [*tc_points, *pc_points])
+        else:
+            add_dependent_updater(destination_texture, warp_texture, [*tc_points, *pc_points])
 
         self.play(
             pc_points[0].animate.shift((0, -1, 0)),
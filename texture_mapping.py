@@ -0,0 +1,60 @@
+import numpy as np
+from sampling import sample
+
+# Rasterizes a textured triangle with NumPy. Bounds are (left, bottom, right, top) in scene units,
+# images are (height, width, 4) uint8 arrays with the first row at the top.
+
+def barycentric_coordinates(points, triangle):
+    # Barycentric coordinates of (N, 2) points with respect to a (3, 2) triangle, or None if it is degenerate
+    a, b, c = np.asarray(triangle, dtype=float)[:, :2]
+    matrix = np.array([b - a, c - a]).T
+    if abs(np.linalg.det(matrix)) < 1e-12:
+        return None
+    beta_gamma = (points - a) @ np.linalg.inv(matrix).T
+    return np.column_stack([1 - beta_gamma.sum(axis=1), beta_gamma])
+
+def map_texture(image, tc_triangle, pc_triangle, source_bounds, destination_bounds, size, filter="bilinear", clip=True):
+    # Map `image`, placed at source_bounds, onto a size = (width, height) canvas at destination_bounds,
+    # such that every point of tc_triangle ends up on the matching point of pc_triangle
+    width, height = size
+    output = np.zeros((height, width, 4), dtype=np.uint8)
+    left, bottom, right, top = destination_bounds
+    pixel_width = (right - left) / width
+    pixel_height = (top - bottom) / height
+
+    # Only rasterize the pixels inside the triangle's bounding box
+    pc_triangle = np.asarray(pc_triangle, dtype=float)[:, :2]
+    if clip:
+        x_start = max(0, int(np.floor((pc_triangle[:, 0].min() - left) / pixel_width)))
+        x_end = min(width, int(np.ceil((pc_triangle[:, 0].max() - left) / pixel_width)))
+        y_start = max(0, int(np.floor((top - pc_triangle[:, 1].max()) / pixel_height)))
+        y_end = min(height, int(np.ceil((top - pc_triangle[:, 1].min()) / pixel_height)))
+    else:
+        x_start, x_end, y_start, y_end = 0, width, 0, height
+    if x_start >= x_end or y_start >= y_end:
+        return output
+
+    xs = left + (np.arange(x_start, x_end) + 0.5) * pixel_width
+    ys = top - (np.arange(y_start, y_end) + 0.5) * pixel_height
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    points = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+
+    weights = barycentric_coordinates(points, pc_triangle)
+    if weights is None:
+        return output
+
+    # Interpolate the texture coordinates, and convert them to texels
+    source = weights @ np.asarray(tc_triangle, dtype=float)[:, :2]
+    source_left, source_bottom, source_right, source_top = source_bounds
+    image_height, image_width = image.shape[:2]
+    texel_x = (source[:, 0] - source_left) / (source_right - source_left) * image_width - 0.5
+    texel_y = (source_top - source[:, 1]) / (source_top - source_bottom) * image_height - 0.5
+
+    mask = (texel_x >= -0.5) & (texel_x <= image_width - 0.5) & (texel_y >= -0.5) & (texel_y <= image_height - 0.5)
+    if clip:
+        mask &= np.all(weights >= -1e-9, axis=1)
+
+    block = np.zeros((len(points), 4))
+    block[mask] = sample(image, np.column_stack([texel_x[mask], texel_y[mask]]), filter)
+    output[y_start:y_end, x_start:x_end] = np.round(block).astype(np.uint8).reshape(y_end - y_start, x_end - x_start, 4)
+    return output